@@ -1,18 +1,121 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, stream_with_context
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import sqlite3
+import time
 from werkzeug.utils import secure_filename
 import secrets
 from database_manager import DatabaseManager  
+from profiling import Profiler
+from response_cache import ResponseCache
+from image_pipeline import ImagePipeline, is_content_hashed
+from catalog_io import FORMATS, guess_format, open_text, read_products, write_products
+from session_store import MemorySessionBackend, ServerSideSessionInterface, SQLiteSessionBackend
+from write_queue import WriteQueueFull
+from password_hasher import HasherBusy, LoginThrottle, PasswordHasher
+from inventory import OutOfStock, ReservationSweeper
+from fragment_cache import FragmentCache, warm_templates
+from rows import UserDetails
+
+class StorefrontFlask(Flask):
+    def get_send_file_max_age(self, filename):
+        # Content-hashed uploads never change, so browsers may keep them for a year
+        if filename and is_content_hashed(filename):
+            return 365 * 24 * 3600
+        return super().get_send_file_max_age(filename)
 
 # Flask App Setup
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)  # Improved secret key generation for security
+app = StorefrontFlask(__name__)
+# Set ECOMMERCE_SECRET_KEY so every worker and restart shares one key
+app.secret_key = os.environ.get('ECOMMERCE_SECRET_KEY') or secrets.token_hex(16)
 app.config['UPLOAD_FOLDER'] = "static/images/"
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}  # Allowed file types for image uploads
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600  # Let browsers reuse product images for an hour
+
+PRODUCTS_PAGE_SIZE = 24
+PRODUCT_SORTS = {'id', 'name', 'price'}
+SEARCH_PAGE_SIZE = 24
+ORDERS_PAGE_SIZE = 20
+ORDERS_PAGE_SIZE_MAX = 100
+PROFILE_TTL = 60.0
 
 # Initialize Database Manager
-db = DatabaseManager()
+db = DatabaseManager(os.environ.get('ECOMMERCE_DB', 'ecommerce.db'))
+
+# Opt-in write-behind: cart and profile writes are group-committed by one thread.
+# ECOMMERCE_WRITE_DURABILITY=queued answers before the commit instead of after it.
+if os.environ.get('ECOMMERCE_WRITE_BEHIND') == '1':
+    db.enable_write_behind(max_delay=float(os.environ.get('ECOMMERCE_WRITE_DELAY_MS', 5)) / 1000,
+                           durability=os.environ.get('ECOMMERCE_WRITE_DURABILITY', 'commit'))
+
+# Sessions live server-side so any worker can serve any request
+if os.environ.get('ECOMMERCE_SESSION_BACKEND', 'sqlite') == 'memory':
+    app.session_interface = ServerSideSessionInterface(MemorySessionBackend())
+else:
+    app.session_interface = ServerSideSessionInterface(SQLiteSessionBackend(db))
+
+# Password hashing runs on a small process pool so login bursts do not stall other routes
+hasher = PasswordHasher(max_workers=int(os.environ.get('ECOMMERCE_HASH_WORKERS', 2)))
+login_throttle = LoginThrottle(max_failures=int(os.environ.get('ECOMMERCE_LOGIN_MAX_FAILURES', 5)))
+
+# Stock reserved by carts goes back on sale once the reservation expires
+ReservationSweeper(db, interval=float(os.environ.get('ECOMMERCE_SWEEP_INTERVAL', 60))).start()
+
+# Recommendations are rebuilt in the background; build the first table now
+db.recommender.start()
+
+# Rendered catalog pages, invalidated by any product change
+page_cache = ResponseCache(db.catalog_version)
+
+# Uploaded product images: stored by content hash, variants built in the background
+images = ImagePipeline(app.config['UPLOAD_FOLDER'], db.set_product_images)
+
+@app.template_global()
+def product_image(product, size='thumbnail'):
+    """Filename of the smallest stored version of a product row's image."""
+    variants = {'thumbnail': 5, 'webp': 6}
+    index = variants.get(size)
+    if index is not None and len(product) > index and product[index]:
+        return product[index]
+    return product[4]
+
+# Product cards and category lists, rendered once per catalog version
+fragments = FragmentCache(db.catalog_version)
+fragments.install(app, db)
+
+# Opt-in profiling: Server-Timing headers, /metrics, per-template render times and a slow query log
+if os.environ.get('ECOMMERCE_PROFILING') == '1':
+    Profiler(slow_query_ms=float(os.environ.get('ECOMMERCE_SLOW_QUERY_MS', 100))).install(app, db, fragments)
+
+# Hand any connection a request left checked out back to the pool
+@app.teardown_appcontext
+def release_db_connections(exception=None):
+    db.release_connections()
+
+# The write queue is full: ask the client to back off instead of queueing more
+@app.errorhandler(WriteQueueFull)
+def write_queue_full(error):
+    return jsonify({"error": "Too busy, try again shortly"}), 503, {"Retry-After": "1"}
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(error):
+    if request.endpoint == 'register':
+        template, message = 'register.html', "Too many sign-ups right now, please try again."
+    else:
+        template, message = 'login.html', "Too many sign-ins right now, please try again."
+    return render_template(template, error=message), 503, {"Retry-After": "1"}
+
+# Adding to the cart or checking out asked for more than is in stock
+@app.errorhandler(OutOfStock)
+def out_of_stock(error):
+    product = db.get_product_by_id(error.product_id)
+    message = f"Sorry, there is not enough stock left of {product.name if product else 'that product'}."
+    if request.is_json:
+        return jsonify({"error": message, "product_id": error.product_id}), 409
+    user_id = session.get('user_id')
+    cart_items = db.get_cart_items(user_id) if user_id else []
+    total_price = sum(item['price'] * item['quantity'] for item in cart_items)
+    return render_template('cart.html', cart_items=cart_items, total_price=total_price, user_id=user_id,
+                           error=message), 409
 
 # Utility function to check if file is allowed
 def allowed_file(filename):
@@ -27,15 +130,26 @@ def login():
         if not username or not password:
             return render_template('login.html', error="Username and password are required!")
 
+        # Refuse locked-out usernames before spending any CPU on hashing
+        retry_after = login_throttle.retry_after(username)
+        if retry_after:
+            return render_template('login.html', error="Too many failed attempts, try again later."), \
+                429, {"Retry-After": str(retry_after)}
+
         user = db.get_user(username) 
 
-        if user and check_password_hash(user[2], password):  # Check hashed password
+        if user and hasher.verify(user[2], password):  # Check hashed password
+            login_throttle.succeeded(username)
+            if hasher.needs_rehash(user[2]):
+                db.update_password(user[0], hasher.hash(password))
+            session.regenerate()  # New session ID on login to prevent fixation
             session['user_id'] = user[0]
             session['username'] = user[1]
             session['is_admin'] = bool(user[3])  
 
             return redirect(url_for('admin' if session['is_admin'] else 'home'))  
 
+        login_throttle.failed(username)
         return render_template('login.html', error="Invalid username or password!")
 
     return render_template('login.html')
@@ -49,6 +163,34 @@ def admin():
     products = db.get_all_products()
     return render_template('admin.html', products=products)
 
+# Sales dashboard, served from the daily rollup tables
+@app.route('/admin/analytics')
+def analytics():
+    if not session.get('is_admin'):
+        return redirect(url_for('login'))
+
+    days = max(1, min(request.args.get('days', 30, type=int), 366))
+    return jsonify(db.get_sales_dashboard(days))
+
+# Set or stop tracking a product's stock: {"stock": 100, "stripes": 4} or {"stock": null}
+@app.route('/admin/products/<int:product_id>/stock', methods=['POST'])
+def set_product_stock(product_id):
+    if not session.get('is_admin'):
+        return jsonify({"error": "Admin only"}), 403
+
+    payload = request.get_json(silent=True) or {}
+    stock = payload.get('stock')
+    stripes = payload.get('stripes', 1)
+    if stock is not None and (not isinstance(stock, int) or stock < 0):
+        return jsonify({"error": "stock must be a non-negative integer or null"}), 400
+    if not isinstance(stripes, int) or not 1 <= stripes <= 64:
+        return jsonify({"error": "stripes must be an integer from 1 to 64"}), 400
+    if not db.get_product_by_id(product_id):
+        return jsonify({"error": "Unknown product"}), 404
+
+    db.set_stock(product_id, stock, stripes)
+    return jsonify({"product_id": product_id, "stock": db.get_stock(product_id)})
+
 # Add Product
 @app.route('/add_product', methods=['POST'])
 def add_product():
@@ -61,12 +203,46 @@ def add_product():
     image = request.files['image']
 
     if image and allowed_file(image.filename):
-        filename = secure_filename(image.filename)
-        image.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-        db.add_product(name, price, category, filename)
+        filename = images.save_upload(image, secure_filename(image.filename))
+        product_id = db.add_product(name, price, category, filename)
+        images.process(product_id, filename)
         return redirect(url_for('admin'))
     return render_template('add_product.html', error="Invalid image format! Allowed formats are .png, .jpg, .jpeg, .gif")
 
+# Bulk catalog import (CSV or JSON Lines, upserted by SKU)
+@app.route('/admin/products/import', methods=['POST'])
+def import_products():
+    if not session.get('is_admin'):
+        return redirect(url_for('login'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    fmt = request.form.get('format') or guess_format(upload.filename)
+    imported = []
+    try:
+        db.import_products(read_products(open_text(upload.stream), fmt),
+                           progress=lambda count: imported.append(count))
+    except ValueError as e:
+        return jsonify({"error": str(e), "imported": imported[-1] if imported else 0}), 400
+
+    return jsonify({"imported": imported[-1] if imported else 0})
+
+# Bulk catalog export, streamed
+@app.route('/admin/products/export')
+def export_products():
+    if not session.get('is_admin'):
+        return redirect(url_for('login'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(write_products(db.iter_products(), fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=products.{fmt}'})
+
 # Delete Product
 @app.route('/delete_product/<int:product_id>')
 def delete_product(product_id):
@@ -100,25 +276,47 @@ def update_product(product_id):
     image = request.files['image']
 
     if image and allowed_file(image.filename):
-        filename = secure_filename(image.filename)
-        image.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        filename = images.save_upload(image, secure_filename(image.filename))
         db.update_product(product_id, name, price, category, filename)
+        images.process(product_id, filename)
     else:
         db.update_product(product_id, name, price, category)
 
     return redirect(url_for('admin'))
 
 @app.route('/')
+@page_cache.cached
 def home():
     user_id = session.get('user_id')
     category = request.args.get('category', 'all')
+    sort = request.args.get('sort', 'id')
+    after = request.args.get('after', type=int)
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
 
-    if category == 'all':
-        products = db.get_all_products()
-    else:
-        products = db.get_products_by_category(category)
+    if sort.lstrip('-') not in PRODUCT_SORTS:
+        sort = 'id'
 
-    return render_template('index.html', products=products, user_id=user_id)
+    category_filter = None if category == 'all' else category
+    products = db.list_products(category_filter, sort, after, PRODUCTS_PAGE_SIZE, min_price, max_price)
+    next_after = products[-1].id if len(products) == PRODUCTS_PAGE_SIZE else None
+    price_summary = db.price_summary(category_filter, min_price, max_price)
+
+    return render_template('index.html', products=products, user_id=user_id,
+                           category=category, sort=sort, next_after=next_after,
+                           min_price=min_price, max_price=max_price, price_summary=price_summary)
+
+@app.route('/search')
+@page_cache.cached
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+
+    products = db.search_products(query, SEARCH_PAGE_SIZE, (page - 1) * SEARCH_PAGE_SIZE) if query else []
+    next_page = page + 1 if len(products) == SEARCH_PAGE_SIZE else None
+
+    return render_template('index.html', products=products, user_id=session.get('user_id'),
+                           query=query, page=page, next_page=next_page)
 
 @app.route('/profile')
 def profile():
@@ -127,7 +325,15 @@ def profile():
     if not user_id:
         return redirect(url_for('login'))
 
-    user = db.get_user_details(user_id)
+    # Cached in the session, which every worker shares, so a worker that did not handle the
+    # update still shows it; other sessions of the same user reload it after PROFILE_TTL seconds
+    cached = session.get('profile')
+    if cached is not None and time.time() - cached['loaded_at'] < PROFILE_TTL:
+        user = UserDetails._make(cached['user'])
+    else:
+        user = db.get_user_details(user_id)
+        if user is not None:
+            session['profile'] = {'loaded_at': time.time(), 'user': list(user)}
 
     return render_template('profile.html', user=user)
 
@@ -142,28 +348,44 @@ def update_profile():
     address = request.form['address']
 
     db.update_user_details(user_id, email, address)
+    session['profile'] = {'loaded_at': time.time(), 'user': [session.get('username'), email, address]}
 
     return redirect(url_for('profile'))
 
 @app.route('/product/<int:product_id>')
+@page_cache.cached
 def product_details(product_id):
     product = db.get_product_by_id(product_id)
     if not product:
         return redirect(url_for('home'))
 
-    return render_template('product_details.html', product=product)
+    recommendations = db.get_recommendations(product_id)
+
+    return render_template('product_details.html', product=product, recommendations=recommendations)
+
+# Live stock for the product page, which is cached per catalog version and so cannot carry it
+@app.route('/product/<int:product_id>/stock')
+def product_stock(product_id):
+    response = jsonify({"product_id": product_id, "stock": db.get_stock(product_id)})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/cart/preview')
 def cart_preview():
     user_id = session.get('user_id') 
     if not user_id:
-        return jsonify({"items": [], "total": 0.00})
-
-    cart_items = db.get_cart_items(user_id)  
+        return jsonify({"count": 0, "total": 0.00})
 
-    total_price = sum(item.get('price', 0) for item in cart_items)  
+    summary = db.get_cart_summary(user_id)
+    etag = f"cart-{user_id}-{summary['version']}"
 
-    return jsonify({"items": cart_items, "total": round(total_price, 2)}) 
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({"count": summary['count'], "total": summary['total']})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/cart')
 def cart():
@@ -172,7 +394,7 @@ def cart():
     if not user_id:
         return redirect(url_for('login'))
 
-    cart_items = db.get_cart_items(user_id) 
+    cart_items = db.get_cart_items(user_id)
     total_price = sum(item['price'] * item['quantity'] for item in cart_items)
 
     return render_template('cart.html', cart_items=cart_items, total_price=total_price, user_id=user_id)
@@ -184,16 +406,49 @@ def add_to_cart(product_id):
     if not user_id:
         return redirect(url_for('login'))
 
-    db.add_to_cart(user_id, product_id)
+    quantity = max(1, request.form.get('quantity', 1, type=int))
+    try:
+        db.reserve_and_add_to_cart(user_id, [(product_id, quantity)])
+    except sqlite3.IntegrityError:
+        return jsonify({"error": "Unknown product"}), 404
 
     return redirect(url_for('cart'))
 
+@app.route('/cart/add_many', methods=['POST'])
+def add_many_to_cart():
+    user_id = session.get('user_id')
+
+    if not user_id:
+        return jsonify({"error": "Login required"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    items = []
+    for entry in payload.get('items', []):
+        try:
+            product_id = int(entry['product_id'])
+            quantity = int(entry.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Each item needs an integer product_id and quantity"}), 400
+        if quantity < 1:
+            return jsonify({"error": "Quantity must be at least 1"}), 400
+        items.append((product_id, quantity))
+
+    if not items:
+        return jsonify({"error": "No items given"}), 400
+
+    try:
+        db.reserve_and_add_to_cart(user_id, items)
+    except sqlite3.IntegrityError:
+        return jsonify({"error": "Unknown product"}), 404
+
+    return jsonify({"added": len(items)})
+
 @app.route('/cart/remove/<int:cart_id>', methods=['POST'])
 def remove_from_cart(cart_id):
     if 'user_id' not in session:
         return redirect(url_for('login')) 
 
-    db.remove_from_cart(cart_id)
+    db.remove_from_cart(cart_id, session['user_id'])
     return redirect(url_for('cart'))
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -208,7 +463,7 @@ def register():
         if not username or not password or not email:
             return render_template('register.html', error="All fields are required!")
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hasher.hash(password)
 
         if db.add_user(username, hashed_password, email, address, is_admin):
             return redirect(url_for('login'))
@@ -247,8 +502,13 @@ def orders():
     if not user_id:
         return redirect(url_for('login'))
 
-    orders = db.get_user_orders(user_id)
-    return render_template('orders.html', orders=orders, user_id=user_id)
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', ORDERS_PAGE_SIZE, type=int), ORDERS_PAGE_SIZE_MAX))
+
+    orders = db.get_user_orders(user_id, before_order_id=before, limit=limit)
+    next_before = orders[-1]['id'] if len(orders) == limit else None
+
+    return render_template('orders.html', orders=orders, user_id=user_id, next_before=next_before)
 
 @app.route('/confirm_order')
 def confirm_order():
@@ -269,19 +529,10 @@ def place_order():
     if not user_id:
         return redirect(url_for('login'))
 
-    cart_items = db.get_cart_items(user_id) 
-    if not cart_items:
+    order_id = db.checkout(user_id)
+    if order_id is None:
         return redirect(url_for('cart'))
 
-    total_price = sum(item['price'] * item['quantity'] for item in cart_items)
-
-    order_id = db.create_order(user_id, total_price)
-
-    for item in cart_items:
-        db.add_order_item(order_id, item['product_id'], item['quantity'], item['price'])
-
-    db.clear_cart(user_id)
-
     return redirect(url_for('order_success'))
 
 @app.route('/order_success')
@@ -290,9 +541,14 @@ def order_success():
 
 @app.route('/logout')
 def logout():
-    session.pop('user_id', None)
+    session.clear()
     return redirect(url_for('home'))
 
+# Compile every template and pre-render fragments now rather than on the first requests
+if os.environ.get('ECOMMERCE_WARM_TEMPLATES', '1') == '1':
+    warm_templates(app)
+    fragments.warm()
+
 if __name__ == '__main__':
     db.create_tables()
     db.insert_products()
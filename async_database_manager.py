@@ -0,0 +1,42 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from database_manager import DatabaseManager
+
+
+class AsyncDatabaseManager:
+    """Asyncio front end for DatabaseManager.
+
+    Every DatabaseManager method is available under the same name as a
+    coroutine.  Calls run on a dedicated thread pool sized to the connection
+    pools, so SQLite work stays off the event loop.  It is meant for asyncio
+    code such as scripts and workers; the Flask views are sync and call
+    DatabaseManager directly, which skips the event loop and thread hop.
+    """
+
+    def __init__(self, db=None, max_workers=None, **kwargs):
+        self.db = db if db is not None else DatabaseManager(**kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self.db.pool.max_size + self.db.read_pool.max_size,
+                                            thread_name_prefix='db')
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # Carry context variables (e.g. the request profile) over to the worker thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, attr, *args, **kwargs))
+
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.db.close()
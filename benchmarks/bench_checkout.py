@@ -0,0 +1,66 @@
+"""Compare orders/sec of the per-line checkout path with DatabaseManager.checkout().
+
+Usage: python benchmarks/bench_checkout.py [--orders N] [--lines N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+def fill_cart(db, user_id, product_ids):
+    for product_id in product_ids:
+        db.add_to_cart(user_id, product_id)
+
+
+def legacy_checkout(db, user_id):
+    """The original /place_order sequence: one commit per statement."""
+    cart_items = db.get_cart_items(user_id)
+    total_price = sum(item['price'] * item['quantity'] for item in cart_items)
+    order_id = db.create_order(user_id, total_price)
+    for item in cart_items:
+        db.add_order_item(order_id, item['product_id'], item['quantity'], item['price'])
+    db.clear_cart(user_id)
+    return order_id
+
+
+def run(label, db, user_id, product_ids, orders, place):
+    elapsed = 0.0
+    for _ in range(orders):
+        fill_cart(db, user_id, product_ids)
+        started = time.perf_counter()
+        place(db, user_id)
+        elapsed += time.perf_counter() - started
+    print(f"{label:<10} {orders / elapsed:10.1f} orders/sec  ({elapsed * 1000 / orders:.2f} ms/order)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        conn = db.connect()
+        conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')")
+        conn.executemany("INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+                         [(f"Product {i}", 10.0 + i, 'Bench') for i in range(args.lines)])
+        conn.commit()
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'bench'").fetchone()[0]
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+        conn.close()
+
+        print(f"{args.orders} orders x {args.lines} cart lines")
+        run('legacy', db, user_id, product_ids, args.orders, legacy_checkout)
+        run('checkout', db, user_id, product_ids, args.orders, lambda d, u: d.checkout(u))
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Hammer one product's stock from many threads: checks for oversell and reports throughput.
+
+Every thread loops reserve -> add to cart -> checkout for its own user until
+the product sells out.  The run fails if more units were sold than were in
+stock or the stock went negative.  It runs once per stripe count.
+
+Usage: python benchmarks/bench_inventory.py [--stock N] [--threads N] [--stripes 1 4 ...] [--no-reserve]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from harness import seed_database, summarize, timed
+
+from inventory import OutOfStock
+
+
+def hammer(db, product_id, user_ids, reserve):
+    latencies = []
+    sold = []
+    rejected = []
+    lock = threading.Lock()
+
+    def buyer(user_id):
+        local_latencies, local_sold, local_rejected = [], 0, 0
+        while True:
+            try:
+                elapsed, _ = timed(_buy_one, db, user_id, product_id, reserve)
+            except OutOfStock:
+                local_rejected += 1
+                db.clear_cart(user_id)
+                break
+            local_latencies.append(elapsed)
+            local_sold += 1
+        with lock:
+            latencies.extend(local_latencies)
+            sold.append(local_sold)
+            rejected.append(local_rejected)
+        db.release_connections()
+
+    threads = [threading.Thread(target=buyer, args=(user_id,)) for user_id in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed), sum(sold)
+
+
+def _buy_one(db, user_id, product_id, reserve):
+    if reserve:
+        db.reserve_and_add_to_cart(user_id, [(product_id, 1)])
+    else:
+        db.add_to_cart(user_id, product_id, 1)
+    return db.checkout(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--stripes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--no-reserve', action='store_true', help='skip the add-to-cart reservation')
+    args = parser.parse_args()
+
+    report = {'config': vars(args)}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = seed_database(os.path.join(tmp, 'bench.db'), users=args.threads, products=10, carts=0, orders=0)
+        conn = db.connect()
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE username LIKE 'user%'")]
+        product_id = conn.execute("SELECT MIN(id) FROM products").fetchone()[0]
+        conn.close()
+
+        for stripes in args.stripes:
+            db.set_stock(product_id, args.stock, stripes)
+            checkouts, sold = hammer(db, product_id, user_ids, not args.no_reserve)
+            left = db.get_stock(product_id)
+            if sold + left != args.stock or left < 0:
+                raise SystemExit(f"Oversold with {stripes} stripe(s): {sold} sold, {left} left of {args.stock}")
+            report[f'stripes_{stripes}'] = {'sold': sold, 'left': left, 'checkouts': checkouts}
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Login storm: logins/sec and the latency of browsing routes while logins run.
+
+Runs the same storm twice through the Flask test client, once hashing inline
+on the request threads and once on the PasswordHasher process pool, and
+prints both results as JSON.
+
+Usage: python benchmarks/bench_login.py [--seconds N] [--login-threads N] [--browse-threads N] [--hash-workers N]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from harness import BENCH_PASSWORD, install_page_templates, seed_database, summarize, timed
+
+
+def storm(storefront, usernames, product_ids, seconds, login_threads, browse_threads, seed):
+    stop = threading.Event()
+    logins = []
+    browse = []
+    lock = threading.Lock()
+
+    def login_worker(index):
+        rng = random.Random(seed + index)
+        client = storefront.app.test_client()
+        local = []
+        while not stop.is_set():
+            elapsed, response = timed(client.post, '/login',
+                                      data={'username': rng.choice(usernames), 'password': BENCH_PASSWORD})
+            if response.status_code == 302:
+                local.append(elapsed)
+        with lock:
+            logins.extend(local)
+
+    def browse_worker(index):
+        rng = random.Random(seed + 1000 + index)
+        client = storefront.app.test_client()
+        local = []
+        while not stop.is_set():
+            url = '/' if rng.random() < 0.5 else f'/product/{rng.choice(product_ids)}'
+            elapsed, response = timed(client.get, url)
+            if response.status_code >= 500:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+            local.append(elapsed)
+        with lock:
+            browse.extend(local)
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(login_threads)]
+    threads += [threading.Thread(target=browse_worker, args=(i,)) for i in range(browse_threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {'logins': summarize(logins, elapsed), 'browse': summarize(browse, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--browse-threads', type=int, default=4)
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        seed_database(db_path, users=args.users, products=args.products, carts=0, orders=0, seed=args.seed).close()
+        os.environ['ECOMMERCE_DB'] = db_path
+        import app as storefront
+        install_page_templates(storefront.app)
+        from password_hasher import LoginThrottle, PasswordHasher
+
+        conn = sqlite3.connect(db_path)
+        usernames = [row[0] for row in conn.execute("SELECT username FROM users WHERE username LIKE 'user%'")]
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+        conn.close()
+
+        report = {'config': vars(args)}
+        for label, workers in (('inline', 0), ('process_pool', args.hash_workers)):
+            storefront.hasher = PasswordHasher(max_workers=workers)
+            storefront.login_throttle = LoginThrottle()
+            report[label] = storm(storefront, usernames, product_ids, args.seconds,
+                                  args.login_threads, args.browse_threads, args.seed)
+            storefront.hasher.shutdown()
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Compare the old per-call recommendation queries with RecommendationEngine.top_k().
+
+Reports lookup latency and the memory held by the precomputed table.
+
+Usage: python benchmarks/bench_recommendations.py [--products N] [--orders N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+def legacy_recommendations(db, product_id):
+    """The original implementation: two queries, every product in the category."""
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT category FROM products WHERE id=?", (product_id,))
+    category = cursor.fetchone()
+    if category:
+        cursor.execute("SELECT id, name, price, image_url FROM products WHERE category=? AND id!=?", (category[0], product_id))
+        recommendations = cursor.fetchall()
+    else:
+        recommendations = []
+    conn.close()
+    return [{'id': p[0], 'name': p[1], 'price': p[2], 'image_url': p[3]} for p in recommendations]
+
+
+def seed(db, products, orders, categories=20, lines=4):
+    rng = random.Random(42)
+    conn = db.connect()
+    conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')")
+    conn.executemany("INSERT INTO products (name, price, category) VALUES (?, ?, ?)",
+                     [(f"Product {i}", rng.uniform(5, 500), f"Category {i % categories}") for i in range(products)])
+    for _ in range(orders):
+        order_id = conn.execute("INSERT INTO orders (user_id, total_price) VALUES (1, 0)").lastrowid
+        picked = rng.sample(range(1, products + 1), lines)
+        conn.executemany("INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, 1, 0)",
+                         [(order_id, product_id) for product_id in picked])
+    conn.commit()
+    conn.close()
+    db.catalog.invalidate()
+
+
+def time_lookups(label, lookup, product_ids):
+    started = time.perf_counter()
+    for product_id in product_ids:
+        lookup(product_id)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {elapsed * 1e6 / len(product_ids):10.1f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        seed(db, args.products, args.orders)
+        db.catalog.snapshot()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        db.recommender.refresh()
+        build = time.perf_counter() - started
+        table_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f"{args.products} products, {args.orders} orders")
+        print(f"engine build {build * 1000:.1f} ms, {table_bytes / 1024:.0f} KiB held")
+
+        rng = random.Random(7)
+        product_ids = [rng.randint(1, args.products) for _ in range(args.lookups)]
+        time_lookups('legacy', lambda product_id: legacy_recommendations(db, product_id), product_ids)
+        time_lookups('engine', db.get_recommendations, product_ids)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Shared pieces of the benchmark suite: synthetic data and latency statistics."""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import ChoiceLoader, DictLoader  # type: ignore
+from werkzeug.security import generate_password_hash  # type: ignore
+
+from database_manager import DatabaseManager
+from password_hasher import password_method
+
+BENCH_PASSWORD = 'benchpassword'
+CATEGORIES = ['Electronics', 'Accessories', 'Home Appliance', 'Fashion', 'Books', 'Toys', 'Garden', 'Sports']
+
+
+def seed_database(path, users=100, products=1000, carts=50, orders=1000, lines=3, seed=42):
+    """Create a synthetic database at ``path`` and return a DatabaseManager for it.
+
+    Every user is named ``user<N>`` with the password BENCH_PASSWORD.  The
+    first ``carts`` users get a cart of ``lines`` products; ``orders`` orders
+    of ``lines`` items each are spread over all users.
+    """
+    rng = random.Random(seed)
+    db = DatabaseManager(path)
+    conn = db.connect()
+    cursor = conn.cursor()
+
+    # One hash is valid for every user and avoids paying PBKDF2 per row
+    password = generate_password_hash(BENCH_PASSWORD, method=password_method())
+    cursor.executemany("INSERT INTO users (username, password, email, address) VALUES (?, ?, ?, ?)",
+                       ((f"user{i}", password, f"user{i}@example.com", f"{i} Bench St") for i in range(users)))
+    cursor.executemany("INSERT INTO products (name, price, category, image_url) VALUES (?, ?, ?, ?)",
+                       ((f"Product {i}", round(rng.uniform(5, 1000), 2), rng.choice(CATEGORIES), f"product{i}.jpg")
+                        for i in range(products)))
+
+    user_ids = [row[0] for row in cursor.execute("SELECT id FROM users")]
+    product_ids = [row[0] for row in cursor.execute("SELECT id FROM products")]
+
+    cursor.executemany("INSERT INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)",
+                       ((user_id, product_id, rng.randint(1, 3))
+                        for user_id in user_ids[:carts]
+                        for product_id in rng.sample(product_ids, lines)))
+
+    for _ in range(orders):
+        order_id = cursor.execute("INSERT INTO orders (user_id, total_price) VALUES (?, 0)",
+                                  (rng.choice(user_ids),)).lastrowid
+        cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
+                           ((order_id, product_id, 1, 10.0) for product_id in rng.sample(product_ids, lines)))
+    cursor.execute('''UPDATE orders SET total_price = (
+                          SELECT SUM(quantity * price) FROM order_items WHERE order_id = orders.id)''')
+    conn.commit()
+    conn.close()
+
+    db.catalog.invalidate()
+    return db
+
+
+# Stand-ins for the page templates, which are not part of this tree.  They touch the same
+# context as real pages would, so the flows still pay for fragments, rows and loops.
+PAGE_TEMPLATES = {
+    'index.html': "{{ category_list(category) }}{% for product in products %}{{ product_card(product) }}{% endfor %}"
+                  "{{ next_after }} {{ price_summary }}",
+    'product_details.html': "{{ product.name }} {{ product.price }}"
+                            "{% for item in recommendations %}{{ item.name }}{% endfor %}",
+    'cart.html': "{% for item in cart_items %}{{ item.name }} {{ item.quantity }}{% endfor %}"
+                 "{{ total_price }} {{ error }}",
+    'checkout.html': "{% for item in cart_items or [] %}{{ item.name }} {{ item.quantity }}{% endfor %}"
+                     "{{ total_price }}",
+    'confirm_order.html': "{% for item in cart_items %}{{ item.name }} {{ item.quantity }}{% endfor %}"
+                          "{{ total_price }}",
+    'orders.html': "{% for order in orders %}{{ order.id }} {{ order.total_price }}"
+                   "{% for item in order.items %}{{ item.name }}{% endfor %}{% endfor %} {{ next_before }}",
+    'profile.html': "{{ user.username }} {{ user.email }} {{ user.address }}",
+    'login.html': "{{ error }}",
+    'register.html': "{{ error }}",
+    'order_success.html': "ok",
+    'admin.html': "{% for product in products %}{{ product.name }}{% endfor %}",
+    'add_product.html': "{{ error }}",
+    'edit_product.html': "{{ product.name }}",
+}
+
+
+def install_page_templates(app):
+    """Let ``app`` fall back to PAGE_TEMPLATES for any page template it does not have on disk."""
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(PAGE_TEMPLATES)])
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed=None):
+    """Turn a list of latencies in seconds into a JSON-friendly summary in ms."""
+    values = sorted(latencies)
+    total = elapsed if elapsed is not None else sum(values)
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) * 1000 / len(values), 4) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 4),
+        'max_ms': round(values[-1] * 1000, 4) if values else 0.0,
+        'ops_per_sec': round(len(values) / total, 2) if total else 0.0,
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Call func and return (elapsed seconds, result)."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
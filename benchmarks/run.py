@@ -0,0 +1,200 @@
+"""Reproducible benchmark suite for DatabaseManager and the storefront.
+
+Seeds a synthetic database, micro-benchmarks every DatabaseManager method
+and drives the Flask test client through browse -> add to cart -> checkout
+-> view orders flows from several threads.  Results are printed (or written
+with --output) as JSON so runs can be compared across commits.
+
+Usage: python benchmarks/run.py [db|flows|all] [--products N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import BENCH_PASSWORD, CATEGORIES, install_page_templates, seed_database, summarize, timed
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def method_benchmarks(db, rng, user_ids, product_ids):
+    """Return (name, setup) pairs; setup() prepares state and returns the call to time."""
+    cart_user = lambda: rng.choice(user_ids)
+    product = lambda: rng.choice(product_ids)
+
+    def remove_from_cart():
+        user_id = cart_user()
+        db.add_to_cart(user_id, product())
+        cart_id = db.get_cart_items(user_id)[-1]['id']
+        return lambda: db.remove_from_cart(cart_id)
+
+    def checkout():
+        user_id = cart_user()
+        db.add_many_to_cart(user_id, [(product(), 1) for _ in range(3)])
+        return lambda: db.checkout(user_id)
+
+    def legacy_order():
+        user_id = cart_user()
+        return lambda: db.add_order_item(db.create_order(user_id, 10.0), product(), 1, 10.0)
+
+    def update_product():
+        product_id = product()
+        row = db.get_product_by_id(product_id)
+        return lambda: db.update_product(product_id, row[1], row[2], row[3])
+
+    def add_and_delete_product():
+        return lambda: (db.add_product('Bench product', 9.99, 'Bench', None),
+                        db.delete_product(db.get_products_by_category('Bench')[0][0]))
+
+    return [
+        ('get_all_products', lambda: db.get_all_products),
+        ('get_product_by_id', lambda: lambda: db.get_product_by_id(product())),
+        ('get_products_by_category', lambda: lambda: db.get_products_by_category(rng.choice(CATEGORIES))),
+        ('list_products', lambda: lambda: db.list_products(rng.choice(CATEGORIES), 'price', None, 24)),
+        ('get_recommendations', lambda: lambda: db.get_recommendations(product())),
+        ('get_user', lambda: lambda: db.get_user(f"user{rng.randrange(len(user_ids))}")),
+        ('get_user_details', lambda: lambda: db.get_user_details(cart_user())),
+        ('update_user_details', lambda: lambda: db.update_user_details(cart_user(), 'bench@example.com', '1 Bench St')),
+        ('get_cart_items', lambda: lambda: db.get_cart_items(cart_user())),
+        ('add_to_cart', lambda: lambda: db.add_to_cart(cart_user(), product())),
+        ('add_many_to_cart', lambda: lambda: db.add_many_to_cart(cart_user(), [(product(), 1) for _ in range(5)])),
+        ('remove_from_cart', remove_from_cart),
+        ('get_user_orders', lambda: lambda: db.get_user_orders(cart_user(), limit=20)),
+        ('checkout', checkout),
+        ('create_order+add_order_item', legacy_order),
+        ('clear_cart', lambda: lambda: db.clear_cart(cart_user())),
+        # Catalog writes invalidate the caches, so they run last
+        ('update_product', update_product),
+        ('add_product+delete_product', add_and_delete_product),
+    ]
+
+
+def run_db(db, iterations, seed):
+    rng = random.Random(seed)
+    conn = db.connect()
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+    conn.close()
+
+    results = {}
+    for name, setup in method_benchmarks(db, rng, user_ids, product_ids):
+        latencies = []
+        for _ in range(iterations):
+            elapsed, _ = timed(setup())
+            latencies.append(elapsed)
+        results[name] = summarize(latencies)
+    return results
+
+
+def shopper(client, rng, username, product_ids, latencies):
+    """One browse -> add to cart -> checkout -> view orders session."""
+    def hit(label, method, url, **kwargs):
+        elapsed, response = timed(getattr(client, method), url, **kwargs)
+        latencies.setdefault(label, []).append(elapsed)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+        return response
+
+    hit('POST /login', 'post', '/login', data={'username': username, 'password': BENCH_PASSWORD})
+    hit('GET /', 'get', '/')
+    hit('GET /?category', 'get', '/', query_string={'category': rng.choice(CATEGORIES), 'sort': 'price'})
+    for product_id in rng.sample(product_ids, 3):
+        hit('GET /product/<id>', 'get', f'/product/{product_id}')
+        hit('POST /cart/add/<id>', 'post', f'/cart/add/{product_id}')
+        hit('GET /cart/preview', 'get', '/cart/preview')
+    hit('GET /cart', 'get', '/cart')
+    hit('GET /checkout', 'get', '/checkout')
+    hit('POST /place_order', 'post', '/place_order')
+    hit('GET /orders', 'get', '/orders')
+    hit('GET /logout', 'get', '/logout')
+
+
+def run_flows(db_path, workers, flows, seed):
+    os.environ['ECOMMERCE_DB'] = db_path
+    import app as storefront
+    install_page_templates(storefront.app)
+
+    conn = sqlite3.connect(db_path)
+    usernames = [row[0] for row in conn.execute("SELECT username FROM users WHERE username LIKE 'user%'")]
+    product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+    conn.close()
+
+    latencies = {}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = {}
+        client = storefront.app.test_client()
+        for _ in range(flows):
+            shopper(client, rng, rng.choice(usernames), product_ids, local)
+        with lock:
+            for label, values in local.items():
+                latencies.setdefault(label, []).extend(values)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    elapsed = time.perf_counter() - started
+
+    requests = [value for values in latencies.values() for value in values]
+    results = {label: summarize(values) for label, values in sorted(latencies.items())}
+    results['overall'] = summarize(requests, elapsed)
+    results['overall']['flows_per_sec'] = round(workers * flows / elapsed, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('suite', nargs='?', choices=['db', 'flows', 'all'], default='all')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--carts', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=200, help='calls per DatabaseManager method')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent shoppers')
+    parser.add_argument('--flows', type=int, default=10, help='sessions per shopper')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'config': {key: value for key, value in vars(args).items() if key not in ('suite', 'output')},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        db = seed_database(db_path, users=args.users, products=args.products, carts=args.carts,
+                           orders=args.orders, seed=args.seed)
+        if args.suite in ('db', 'all'):
+            report['db'] = run_db(db, args.iterations, args.seed)
+        db.close()
+        if args.suite in ('flows', 'all'):
+            report['flows'] = run_flows(db_path, args.workers, args.flows, args.seed)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
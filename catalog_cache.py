@@ -0,0 +1,252 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+try:
+    import numpy  # type: ignore
+except ImportError:  # the price columns fall back to array.array and plain loops
+    numpy = None
+
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['version', 'products', 'by_id', 'by_category', 'loaded_at', 'views'])
+
+# Columns products can be listed by, as indexes into a product row
+SORT_COLUMNS = {'id': 0, 'name': 1, 'price': 2}
+
+_MISSING = object()
+
+
+class ProductColumns:
+    """Ids, prices and category codes of a snapshot's products as parallel arrays.
+
+    Position ``i`` in every column describes ``snapshot.products[i]``.  With
+    NumPy the columns are ndarrays and sorting and price filters are
+    vectorized; without it they are compact ``array`` columns and the same
+    operations run as loops.
+    """
+
+    def __init__(self, products):
+        self.categories = sorted({row[3] for row in products})
+        codes = {category: code for code, category in enumerate(self.categories)}
+        if numpy is not None:
+            count = len(products)
+            self.ids = numpy.fromiter((row[0] for row in products), numpy.int64, count)
+            self.prices = numpy.fromiter((row[2] for row in products), numpy.float64, count)
+            self.category_codes = numpy.fromiter((codes[row[3]] for row in products), numpy.int32, count)
+        else:
+            self.ids = array('q', (row[0] for row in products))
+            self.prices = array('d', (row[2] for row in products))
+            self.category_codes = array('l', (codes[row[3]] for row in products))
+        self._codes = codes
+
+    def positions(self, category=None):
+        """Positions of the products in ``category`` (all products if None)."""
+        if category is None:
+            return numpy.arange(len(self.ids)) if numpy is not None else range(len(self.ids))
+        code = self._codes.get(category, -1)
+        if numpy is not None:
+            return numpy.flatnonzero(self.category_codes == code)
+        return [i for i, c in enumerate(self.category_codes) if c == code]
+
+    def order(self, positions, column):
+        """Sort ``positions`` by (price or id, id); None for columns kept out of the arrays."""
+        if column not in (0, 2):
+            return None
+        if numpy is not None:
+            keys = self.ids if column == 0 else self.prices
+            return positions[numpy.lexsort((self.ids[positions], keys[positions]))]
+        keys = self.ids if column == 0 else self.prices
+        return sorted(positions, key=lambda i: (keys[i], self.ids[i]))
+
+    def in_price_range(self, positions, min_price=None, max_price=None):
+        """The subset of ``positions`` priced within [min_price, max_price], order kept."""
+        if numpy is not None:
+            positions = numpy.asarray(positions, dtype=numpy.int64)
+            prices = self.prices[positions]
+            keep = numpy.ones(len(positions), dtype=bool)
+            if min_price is not None:
+                keep &= prices >= min_price
+            if max_price is not None:
+                keep &= prices <= max_price
+            return positions[keep]
+        low = float('-inf') if min_price is None else min_price
+        high = float('inf') if max_price is None else max_price
+        prices = self.prices
+        return [i for i in positions if low <= prices[i] <= high]
+
+
+class CatalogCache:
+    """In-process cache of the product catalog.
+
+    Holds an immutable snapshot of every product row, indexed by id and by
+    category, plus a bounded LRU of individual products with a TTL.  Writers
+    call invalidate(), which bumps the catalog version and drops both.
+
+    ``load_all`` returns every product row; ``load_one`` returns one row by
+    id (or None).  Rows are immutable tuples in products table column
+    order (rows.Product), so row[0] is the id, row[2] the price and row[3]
+    the category.
+    """
+
+    def __init__(self, load_all, load_one, ttl=300.0, max_entries=1024):
+        self._load_all = load_all
+        self._load_one = load_one
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._version = 1
+        self._snapshot = None
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at < self.ttl
+
+    def snapshot(self):
+        """Return the current catalog snapshot, loading it if needed."""
+        snapshot = self._snapshot
+        if snapshot is not None and self._fresh(snapshot.loaded_at):
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and self._fresh(snapshot.loaded_at):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            version = self._version
+            products = tuple(self._load_all())
+            by_category = {}
+            for row in products:
+                by_category.setdefault(row[3], []).append(row)
+            snapshot = CatalogSnapshot(
+                version=version,
+                products=products,
+                by_id=MappingProxyType({row[0]: row for row in products}),
+                by_category=MappingProxyType({category: tuple(rows) for category, rows in by_category.items()}),
+                loaded_at=time.monotonic(),
+                views={},
+            )
+            # An invalidate() while loading means the rows may already be stale
+            if version == self._version:
+                self._snapshot = snapshot
+            return snapshot
+
+    def _columns(self, snapshot):
+        columns = snapshot.views.get('columns')
+        if columns is None:
+            columns = snapshot.views['columns'] = ProductColumns(snapshot.products)
+        return columns
+
+    def _sorted_view(self, snapshot, category, column):
+        key = (category, column)
+        view = snapshot.views.get(key)
+        if view is None:
+            columns = self._columns(snapshot)
+            positions = columns.positions(category or None)
+            order = columns.order(positions, column)
+            if order is None:
+                products = snapshot.products
+                order = sorted(positions, key=lambda i: (products[i][column], products[i][0]))
+            rows = tuple(snapshot.products[i] for i in order)
+            view = snapshot.views[key] = (rows, [(row[column], row[0]) for row in rows], order)
+        return view
+
+    def page(self, category=None, sort='id', after_id=None, limit=24, min_price=None, max_price=None):
+        """Return up to ``limit`` products following ``after_id`` in ``sort`` order.
+
+        ``sort`` is a key of SORT_COLUMNS, prefixed with '-' for descending.
+        Each (category, sort) ordering is built once per catalog version, so
+        a page is a binary search plus a slice.  A price range is applied to
+        the rest of the ordering through the price column.
+        """
+        descending = sort.startswith('-')
+        column = SORT_COLUMNS[sort.lstrip('-')]
+        snapshot = self.snapshot()
+        rows, keys, order = self._sorted_view(snapshot, category, column)
+
+        start, stop = 0, len(rows)
+        if after_id is not None:
+            after = snapshot.by_id.get(after_id)
+            if after is None or (category and after[3] != category):
+                return ()
+            key = (after[column], after[0])
+            if descending:
+                stop = bisect_left(keys, key)
+            else:
+                start = bisect_right(keys, key)
+
+        if min_price is None and max_price is None:
+            page = rows[max(stop - limit, 0):stop] if descending else rows[start:start + limit]
+        else:
+            matches = self._columns(snapshot).in_price_range(order[start:stop], min_price, max_price)
+            matches = matches[max(len(matches) - limit, 0):] if descending else matches[:limit]
+            page = tuple(snapshot.products[i] for i in matches)
+        return page[::-1] if descending else page
+
+    def price_summary(self, category=None, min_price=None, max_price=None):
+        """Number of matching products and their lowest and highest price."""
+        snapshot = self.snapshot()
+        columns = self._columns(snapshot)
+        matches = columns.in_price_range(columns.positions(category or None), min_price, max_price)
+        if not len(matches):
+            return {"count": 0, "min_price": None, "max_price": None}
+        if numpy is not None:
+            prices = columns.prices[matches]
+            return {"count": int(len(matches)), "min_price": float(prices.min()), "max_price": float(prices.max())}
+        prices = [columns.prices[i] for i in matches]
+        return {"count": len(matches), "min_price": min(prices), "max_price": max(prices)}
+
+    def get_product(self, product_id):
+        """Return one product row, or None if it does not exist."""
+        snapshot = self._snapshot
+        if snapshot is not None and self._fresh(snapshot.loaded_at):
+            self.hits += 1
+            return snapshot.by_id.get(product_id)
+
+        with self._lock:
+            entry = self._entries.get(product_id, _MISSING)
+            if entry is not _MISSING and self._fresh(entry[0]):
+                self._entries.move_to_end(product_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self._version
+
+        row = self._load_one(product_id)
+
+        with self._lock:
+            if version == self._version:
+                self._entries[product_id] = (time.monotonic(), row)
+                self._entries.move_to_end(product_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return row
+
+    def invalidate(self):
+        """Drop everything cached and bump the catalog version."""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+            self._entries.clear()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "snapshot_size": len(snapshot.products) if snapshot is not None else 0,
+        }
@@ -0,0 +1,88 @@
+"""Streaming CSV / JSON Lines conversion for bulk catalog import and export.
+
+Both directions work one row at a time, so memory stays flat however large
+the file is.  DatabaseManager.import_products() and iter_products() do the
+database side.
+"""
+import csv
+import io
+import json
+
+FIELDS = ['sku', 'name', 'price', 'category', 'image_url']
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 64 * 1024
+
+
+def guess_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def _clean(record, line):
+    try:
+        name = str(record['name']).strip()
+        category = str(record['category']).strip()
+        price = float(record['price'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"line {line}: needs name, price and category ({e})") from None
+    if not name or not category:
+        raise ValueError(f"line {line}: name and category must not be empty")
+    # The SKU is the upsert key; a row without one would be inserted again on every import
+    sku = str(record.get('sku') or '').strip()
+    if not sku:
+        raise ValueError(f"line {line}: sku must not be empty")
+    image_url = str(record.get('image_url') or '').strip() or None
+    return sku, name, price, category, image_url
+
+
+def read_products(stream, fmt):
+    """Yield (sku, name, price, category, image_url) tuples from a text stream."""
+    if fmt == 'csv':
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield _clean(record, line)
+    elif fmt == 'jsonl':
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    raise ValueError(f"line {line}: invalid JSON ({e})") from None
+                yield _clean(record, line)
+    else:
+        raise ValueError(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def open_text(binary_stream):
+    """Wrap an uploaded binary stream for read_products()."""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def write_products(rows, fmt):
+    """Yield text chunks for (sku, name, price, category, image_url) rows."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'jsonl':
+        lines, size = [], 0
+        for row in rows:
+            line = json.dumps(dict(zip(FIELDS, row))) + '\n'
+            lines.append(line)
+            size += len(line)
+            if size > CHUNK_SIZE:
+                yield ''.join(lines)
+                lines, size = [], 0
+        yield ''.join(lines)
+    else:
+        raise ValueError(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
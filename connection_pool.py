@@ -0,0 +1,231 @@
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class PooledConnection:
+    """A pooled sqlite3 connection.
+
+    Behaves like a regular sqlite3 connection, except that close() hands it
+    back to the pool instead of closing it, and leaving a ``with`` block
+    commits (or rolls back) and then returns it to the pool.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out = False
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        """Return the connection to the pool."""
+        if self._checked_out:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    Connections are created lazily up to ``max_size`` and configured once
+    (WAL journal, synchronous=NORMAL, foreign keys, page cache).  Callers
+    block for at most ``timeout`` seconds when every connection is in use.
+    With ``read_only`` the connections are opened with ``mode=ro`` and
+    ``query_only``; over WAL they still see every committed write.
+    """
+
+    def __init__(self, database, max_size=8, timeout=5.0, cache_size_kib=8192,
+                 busy_timeout_ms=5000, health_check_interval=30.0, uri=False, read_only=False):
+        if read_only and not uri:
+            database = pathlib.Path(database).absolute().as_uri() + "?mode=ro"
+            uri = True
+        self.database = database
+        self.read_only = read_only
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_size_kib = cache_size_kib
+        self.busy_timeout_ms = busy_timeout_ms
+        self.health_check_interval = health_check_interval
+        self.uri = uri
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._size = 0
+        self._closed = False
+
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._in_use = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def _configure(self, raw):
+        if self.read_only:
+            raw.execute("PRAGMA query_only=ON")
+        else:
+            raw.execute("PRAGMA journal_mode=WAL")
+            raw.execute("PRAGMA synchronous=NORMAL")
+            raw.execute("PRAGMA foreign_keys=ON")
+        raw.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        raw.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        raw.execute("PRAGMA temp_store=MEMORY")
+
+    def _create(self):
+        raw = sqlite3.connect(self.database, uri=self.uri, check_same_thread=False)
+        try:
+            self._configure(raw)
+        except sqlite3.Error:
+            raw.close()
+            raise
+        with self._lock:
+            self._created += 1
+        return PooledConnection(self, raw)
+
+    def _is_healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            conn._raw.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn._raw.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._discarded += 1
+
+    def _held(self):
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = []
+        return held
+
+    def acquire(self):
+        """Check a connection out of the pool."""
+        if self._closed:
+            raise PoolTimeout("connection pool is closed")
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        conn = None
+        while conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_grow = self._size < self.max_size
+                    if can_grow:
+                        self._size += 1
+                if can_grow:
+                    try:
+                        conn = self._create()
+                    except Exception:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"no connection available after {self.timeout}s")
+                try:
+                    conn = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        conn._checked_out = True
+        self._held().append(conn)
+        return conn
+
+    def release(self, conn):
+        """Return a checked-out connection to the pool."""
+        if not conn._checked_out:
+            return
+        conn._checked_out = False
+        held = self._held()
+        if conn in held:
+            held.remove(conn)
+        with self._lock:
+            self._in_use -= 1
+
+        try:
+            if conn._raw.in_transaction:
+                conn._raw.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        self._idle.put(conn)
+
+    def release_thread(self):
+        """Return every connection still held by the current thread."""
+        for conn in list(self._held()):
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "wait_time_total": round(self._wait_time, 6),
+                "wait_time_max": round(self._max_wait, 6),
+            }
@@ -1,63 +1,90 @@
+import argparse
+import itertools
+import json
 import sqlite3
+import sys
+import time
 from werkzeug.security import generate_password_hash # type: ignore
+from connection_pool import ConnectionPool
+from migrations import apply_migrations, create_base_tables
+from catalog_cache import CatalogCache
+from recommendations import RecommendationEngine
+from ttl_cache import TTLCache
+from write_queue import WriteBehindQueue
+from password_hasher import password_method
+from inventory import OutOfStock, return_stock, take_stock
+from rows import CartItem, CartSummary, Order, OrderItem, Product, UserDetails
+from queries import (ADD_TO_CART_SQL, ALL_PRODUCTS_SQL, ANY_TRACKED_SQL, CART_ITEMS_SQL, CART_SUMMARY_SQL,
+                     CART_TOTAL_SQL, CHECKOUT_ITEMS_SQL, CLEAR_CART_SQL, EXPIRED_RESERVATIONS_SQL, PRODUCT_BY_ID_SQL,
+                     REMOVE_FROM_CART_SQL, RESERVE_STOCK_SQL, SEARCH_PRODUCTS_SQL, TRACKED_CART_LINES_SQL,
+                     USER_BY_NAME_SQL, USER_DETAILS_SQL, USER_ORDERS_SQL, USER_RESERVATIONS_SQL)
+
+def _is_busy(error):
+    """True if an OperationalError means another connection holds the write lock."""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+# Shown in order history for lines whose product has been deleted
+DELETED_PRODUCT_NAME = "Deleted product"
 
 class DatabaseManager:
-    def __init__(self, db_name='ecommerce.db'):
+    def __init__(self, db_name='ecommerce.db', pool_size=8, pool_timeout=5.0, writer_timeout=30.0, catalog_ttl=300.0,
+                 cart_summary_ttl=5.0, reservation_ttl=900.0):
         self.db_name = db_name
+        # One serialized writer; reads use their own pool of read-only connections
+        self.pool = ConnectionPool(db_name, max_size=1, timeout=writer_timeout)
+        self.read_pool = ConnectionPool(db_name, max_size=pool_size, timeout=pool_timeout, read_only=True)
+        self.catalog = CatalogCache(self._load_all_products, self._load_product, ttl=catalog_ttl)
+        self.recommender = RecommendationEngine(self)
+        # Short TTL: other worker processes may change a cart without telling us
+        self.cart_summaries = TTLCache(max_entries=10000, ttl=cart_summary_ttl)
+        self.write_queue = None
+        self.reservation_ttl = reservation_ttl
         self.create_tables()
 
     def connect(self):
-        return sqlite3.connect(self.db_name)
+        """Check out the writer connection; close() or leaving a with-block returns it."""
+        return self.pool.acquire()
+
+    def read_connect(self):
+        """Check out a read-only connection. It sees every committed write, including the caller's own."""
+        return self.read_pool.acquire()
+
+    def release_connections(self):
+        """Return any connections the current thread still holds to the pools."""
+        self.pool.release_thread()
+        self.read_pool.release_thread()
+
+    def pool_stats(self):
+        return {"writer": self.pool.stats(), "reader": self.read_pool.stats()}
+
+    def enable_write_behind(self, **options):
+        """Send cart and profile writes through a group-committing WriteBehindQueue."""
+        if self.write_queue is None:
+            self.write_queue = WriteBehindQueue(self, **options)
+        return self.write_queue
+
+    def _see_own_writes(self, user_id):
+        """Wait for the user's queued writes to commit before reading their data."""
+        if self.write_queue is not None:
+            self.write_queue.wait_for(user_id)
+
+    def close(self):
+        self.recommender.stop()
+        if self.write_queue is not None:
+            self.write_queue.close()
+        self.pool.close()
+        self.read_pool.close()
 
     def create_tables(self):
-        """Create users, products, and cart tables if they do not exist."""
+        """Create users, products, and cart tables if they do not exist, then apply migrations."""
         conn = self.connect()
-
-        cursor = conn.cursor()
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                          id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          username TEXT UNIQUE NOT NULL,
-                          password TEXT NOT NULL,
-                          email TEXT,
-                          address TEXT,
-                          is_admin INTEGER DEFAULT 0)''')
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS products (
-                          id INTEGER PRIMARY KEY AUTOINCREMENT,
-                          name TEXT NOT NULL,
-                          price REAL NOT NULL,
-                          category TEXT NOT NULL,
-                          image_url TEXT)''')
-
-        cursor.execute('''CREATE TABLE IF NOT EXISTS cart (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            user_id INTEGER NOT NULL,
-                            product_id INTEGER NOT NULL,
-                            quantity INTEGER DEFAULT 1,
-                            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
-                            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
-                          ) ''')
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS orders (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            user_id INTEGER NOT NULL,
-                            total_price REAL NOT NULL,
-                            date TEXT DEFAULT CURRENT_TIMESTAMP,
-                            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-                            )''')
-        
-        cursor.execute('''CREATE TABLE IF NOT EXISTS order_items (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            order_id INTEGER NOT NULL,
-                            product_id INTEGER NOT NULL,
-                            quantity INTEGER NOT NULL,
-                            price REAL NOT NULL,
-                            FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE,
-                            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
-                        )''')
-
+        create_base_tables(conn.cursor())
         conn.commit()
+        apply_migrations(conn)
         conn.close()
 
     def create_admin_user(self):
@@ -69,7 +96,7 @@ class DatabaseManager:
         existing_admin = cursor.fetchone()
 
         if not existing_admin:
-            hashed_password = generate_password_hash("adminpassword", method="pbkdf2:sha256")
+            hashed_password = generate_password_hash("adminpassword", method=password_method())
             cursor.execute(
                 "INSERT INTO users (username, password, email, address, is_admin) VALUES (?, ?, ?, ?, ?)",
                 ("admin", hashed_password, "admin@gmail.com", "123 Admin St", 1)
@@ -92,8 +119,17 @@ class DatabaseManager:
         except sqlite3.IntegrityError:
             return False
     
+    def update_password(self, user_id, pwhash):
+        """Replace a user's stored password hash, e.g. after rehashing at a new cost."""
+        with self.connect() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (pwhash, user_id))
+
     def update_user_details(self, user_id, email, address):
         """Update user details (email, address) in the database."""
+        if self.write_queue is not None:
+            self.write_queue.submit(user_id, "UPDATE users SET email = ?, address = ? WHERE id = ?",
+                                    (email, address, user_id))
+            return
         with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE users SET email = ?, address = ? WHERE id = ?", (email, address, user_id))
@@ -108,7 +144,7 @@ class DatabaseManager:
         existing_admin = cursor.fetchone()
 
         if not existing_admin:
-            hashed_password = generate_password_hash("adminpassword", method="pbkdf2:sha256")
+            hashed_password = generate_password_hash("adminpassword", method=password_method())
             cursor.execute("INSERT INTO users (username, password, email, address, is_admin) VALUES (?, ?, ?, ?, ?)",
                         ("admin", hashed_password, "admin@gmail.com", "123 Main St, Anytown, USA", 1))
             conn.commit()
@@ -140,131 +176,204 @@ class DatabaseManager:
             ]
             cursor.executemany("INSERT INTO products (name, price, category, image_url) VALUES (?, ?, ?, ?)", products)
             conn.commit()
+            self._catalog_changed()
 
         conn.close()
 
-    def get_all_products(self):
-        """Retrieve all products from the database."""
-        conn = self.connect()
+    def _load_all_products(self):
+        conn = self.read_connect()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products")
-        products = cursor.fetchall()
+        cursor.execute(ALL_PRODUCTS_SQL)
+        products = list(map(Product._make, cursor))
         conn.close()
         return products
 
-    def get_product_by_id(self, product_id):
-        """Retrieve product details by ID."""
-        with self.connect() as conn:
+    def _load_product(self, product_id):
+        with self.read_connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-            return cursor.fetchone()
+            cursor.execute(PRODUCT_BY_ID_SQL, (product_id,))
+            row = cursor.fetchone()
+            return Product._make(row) if row else None
 
-    def get_recommendations(self, product_id):
-        """Get recommended products based on the same category."""
-        conn = self.connect()
-        cursor = conn.cursor()
+    def get_all_products(self):
+        """Retrieve all products, served from the catalog cache."""
+        return self.catalog.snapshot().products
 
-        cursor.execute("SELECT category FROM products WHERE id=?", (product_id,))
-        category = cursor.fetchone()
+    def get_product_by_id(self, product_id):
+        """Retrieve product details by ID, served from the catalog cache."""
+        return self.catalog.get_product(product_id)
+
+    def get_products_by_category(self, category):
+        """Retrieve all products in a category, served from the catalog cache."""
+        return self.catalog.snapshot().by_category.get(category, ())
+
+    def list_products(self, category=None, sort='id', after_id=None, limit=24, min_price=None, max_price=None):
+        """Return one page of products, optionally filtered by category and price.
+
+        Pages are keyed on the last product ID of the previous page, so any
+        page costs the same no matter how deep into the catalog it is.
+        """
+        return self.catalog.page(category, sort, after_id, limit, min_price, max_price)
+
+    def price_summary(self, category=None, min_price=None, max_price=None):
+        """Count and price range of the products matching a home page filter."""
+        return self.catalog.price_summary(category, min_price, max_price)
+
+    def search_products(self, query, limit=20, offset=0):
+        """Full-text search over product names and categories, best matches first.
+
+        Every word of ``query`` is matched as a prefix, so "lap" finds "Laptop".
+        """
+        terms = ['"' + word.replace('"', '') + '"*' for word in query.split() if word.replace('"', '')]
+        if not terms:
+            return []
+        with self.read_connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SEARCH_PRODUCTS_SQL, (' '.join(terms), limit, offset))
+            return list(map(Product._make, cursor))
 
-        if category:
-            cursor.execute("SELECT id, name, price, image_url FROM products WHERE category=? AND id!=?", (category[0], product_id))
-            recommendations = cursor.fetchall()
-        else:
-            recommendations = []
+    def catalog_version(self):
+        """Version number that changes whenever a product is added, updated or deleted."""
+        return self.catalog.version
 
-        conn.close()
-        return [{'id': p[0], 'name': p[1], 'price': p[2], 'image_url': p[3]} for p in recommendations]
+    def _catalog_changed(self):
+        self.catalog.invalidate()
+        # Price changes and deletions alter other users' cart totals
+        self.cart_summaries.clear()
+
+    def get_recommendations(self, product_id, limit=None):
+        """Get recommended products, ranked by co-purchases and then by category best sellers."""
+        return self.recommender.top_k(product_id, limit)
 
     def get_cart_items(self, user_id):
         """Retrieve cart items for a specific user."""
-        with self.connect() as conn:
+        self._see_own_writes(user_id)
+        with self.read_connect() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT cart.id, products.name, products.price, cart.quantity, products.image_url, products.id 
-                FROM cart 
-                JOIN products ON cart.product_id = products.id 
-                WHERE cart.user_id = ?
-            ''', (user_id,))
-            cart_items = cursor.fetchall()
+            cursor.execute(CART_ITEMS_SQL, (user_id,))
+            return list(map(CartItem._make, cursor))
 
-            return [{'id': item[0], 'name': item[1], 'price': item[2], 'quantity': item[3], 'image_url': item[4], 'product_id': item[5]} for item in cart_items]
-
-    def add_to_cart(self, user_id, product_id):
+    def add_to_cart(self, user_id, product_id, quantity=1):
         """Add product to cart, increasing quantity if already exists."""
+        if self.write_queue is not None:
+            self.write_queue.submit(user_id, ADD_TO_CART_SQL, (user_id, product_id, quantity),
+                                    on_commit=lambda: self.cart_summaries.pop(user_id))
+            return
         with self.connect() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT quantity FROM cart WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-            item = cursor.fetchone()
-
-            if item:
-                cursor.execute("UPDATE cart SET quantity = quantity + 1 WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-            else:
-                cursor.execute("INSERT INTO cart (user_id, product_id, quantity) VALUES (?, ?, 1)", (user_id, product_id))
-            
-            conn.commit()
-
-    def remove_from_cart(self, cart_id):
-        """Remove a product from the cart."""
+            conn.execute(ADD_TO_CART_SQL, (user_id, product_id, quantity))
+        self.cart_summaries.pop(user_id)
+
+    def add_many_to_cart(self, user_id, items):
+        """Add several (product_id, quantity) pairs to the cart in one transaction."""
+        if self.write_queue is not None:
+            self.write_queue.submit(user_id, ADD_TO_CART_SQL,
+                                    [(user_id, product_id, quantity) for product_id, quantity in items],
+                                    many=True, on_commit=lambda: self.cart_summaries.pop(user_id))
+            return
+        with self.connect() as conn:
+            conn.executemany(ADD_TO_CART_SQL,
+                             ((user_id, product_id, quantity) for product_id, quantity in items))
+        self.cart_summaries.pop(user_id)
+
+    def remove_from_cart(self, cart_id, user_id=None):
+        """Remove a product from the cart, only from ``user_id``'s cart if given."""
+        if self.write_queue is not None and user_id is not None:
+            self.write_queue.submit(user_id, REMOVE_FROM_CART_SQL, (cart_id, user_id),
+                                    on_commit=lambda: self.cart_summaries.pop(user_id))
+            return
         conn = self.connect()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM cart WHERE id=?", (cart_id,))
+        if user_id is None:
+            cursor.execute("DELETE FROM cart WHERE id=?", (cart_id,))
+        else:
+            cursor.execute(REMOVE_FROM_CART_SQL, (cart_id, user_id))
         conn.commit()
         conn.close()
+        if user_id is None:
+            self.cart_summaries.clear()
+        else:
+            self.cart_summaries.pop(user_id)
+
+    def get_cart_summary(self, user_id):
+        """Return the item count, total and version of a user's cart.
+
+        The numbers come from the trigger-maintained cart_summary table and
+        are cached briefly; the version changes with every cart change.
+        """
+        self._see_own_writes(user_id)
+        summary = self.cart_summaries.get(user_id)
+        if summary is not None:
+            return summary
+
+        token = self.cart_summaries.token()
+        with self.read_connect() as conn:
+            row = conn.execute(CART_SUMMARY_SQL, (user_id,)).fetchone()
+        if row:
+            summary = CartSummary(row[0], round(row[1], 2), row[2])
+        else:
+            summary = CartSummary(0, 0.0, 0)
+        self.cart_summaries.set(user_id, summary, token)
+        return summary
 
     def get_user(self, username):
         """Retrieve user details for authentication (without checking password in SQL)."""
-        with self.connect() as conn:
+        with self.read_connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, username, password, is_admin FROM users WHERE username=?", (username,))
+            cursor.execute(USER_BY_NAME_SQL, (username,))
             return cursor.fetchone()
 
     def get_user_details(self, user_id):
-        with self.connect() as conn:
+        """Return a user's profile; the app caches it in the shared session."""
+        self._see_own_writes(user_id)
+        with self.read_connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT username, email, address FROM users WHERE id = ?", (user_id,))
+            cursor.execute(USER_DETAILS_SQL, (user_id,))
             user = cursor.fetchone()
-            if user:
-                return {"username": user[0], "email": user[1], "address": user[2]}
-            return None
+        return UserDetails._make(user) if user else None
+
+    def get_user_orders(self, user_id, before_order_id=None, limit=None):
+        """Retrieve a user's orders with their products, newest first.
+
+        Pass the smallest order ID of the previous page as ``before_order_id``
+        to page through history with a keyset instead of an OFFSET.
+        """
+        limit = -1 if limit is None else limit
+        # A plain "id < ?" lets SQLite seek straight to the keyset on (user_id, id)
+        if before_order_id is None:
+            sql, params = USER_ORDERS_SQL.format(keyset=""), (user_id, limit)
+        else:
+            sql, params = USER_ORDERS_SQL.format(keyset="AND id < ?"), (user_id, before_order_id, limit)
 
-    def get_user_orders(self, user_id):
-        """Retrieve all orders for a specific user, including products."""
-        with self.connect() as conn:
+        conn = self.read_connect()
+        try:
             cursor = conn.cursor()
-
-            cursor.execute("SELECT id, total_price, date FROM orders WHERE user_id = ?", (user_id,))
-            orders = cursor.fetchall()
+            cursor.execute(sql, params)
 
             all_orders = []
-            for order in orders:
-                order_id, total_price, date = order
-
-                cursor.execute("""
-                    SELECT products.name, order_items.quantity, order_items.price, products.image_url
-                    FROM order_items
-                    JOIN products ON order_items.product_id = products.id
-                    WHERE order_items.order_id = ?
-                """, (order_id,))
-                items = cursor.fetchall()
-
-                all_orders.append({
-                    "id": order_id,
-                    "total_price": total_price,
-                    "date": date,
-                    "items": [{"name": item[0], "quantity": item[1], "price": item[2], "image_url": item[3]} for item in items]
-                })
+            current = None
+            for order_id, total_price, date, item_id, name, quantity, price, image_url in cursor:
+                if current is None or current.id != order_id:
+                    current = Order(order_id, total_price, date, [])
+                    all_orders.append(current)
+                # No item ID: the order has no lines.  No name: the product has since been deleted
+                if item_id is not None:
+                    current.items.append(OrderItem(name if name is not None else DELETED_PRODUCT_NAME,
+                                                   quantity, price, image_url))
 
             return all_orders
+        finally:
+            conn.close()
 
     def add_product(self, name, price, category, image_filename):
-        """Insert a new product into the products table."""
+        """Insert a new product into the products table and return its ID."""
         with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO products (name, price, category, image_url) VALUES (?, ?, ?, ?)",
                         (name, price, category, image_filename))
             conn.commit()
+            product_id = cursor.lastrowid
+        self._catalog_changed()
+        return product_id
 
     def update_product(self, product_id, name, price, category, image_filename=None):
         """Update product details in the database."""
@@ -272,20 +381,75 @@ class DatabaseManager:
             cursor = conn.cursor()
 
             if image_filename:
-                cursor.execute("UPDATE products SET name = ?, price = ?, category = ?, image_url = ? WHERE id = ?",
+                cursor.execute('''UPDATE products SET name = ?, price = ?, category = ?, image_url = ?,
+                                  thumbnail_url = NULL, webp_url = NULL WHERE id = ?''',
                             (name, price, category, image_filename, product_id))
             else:
                 cursor.execute("UPDATE products SET name = ?, price = ?, category = ? WHERE id = ?",
                             (name, price, category, product_id))
 
             conn.commit()
+        self._catalog_changed()
+
+    def import_products(self, rows, chunk_size=10000, progress=None):
+        """Upsert (sku, name, price, category, image_url) rows, keyed by SKU.
+
+        Rows are consumed lazily and written with executemany, one transaction
+        per ``chunk_size`` rows; ``progress(total_so_far)`` is called after
+        each commit. Returns the number of rows imported.
+        """
+        rows = iter(rows)
+        total = 0
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                with self.connect() as conn:
+                    conn.executemany('''
+                        INSERT INTO products (sku, name, price, category, image_url) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(sku) DO UPDATE SET
+                            name = excluded.name,
+                            price = excluded.price,
+                            category = excluded.category,
+                            image_url = COALESCE(excluded.image_url, products.image_url)
+                    ''', chunk)
+                total += len(chunk)
+                if progress:
+                    progress(total)
+        finally:
+            if total:
+                self._catalog_changed()
+        return total
+
+    def iter_products(self, batch_size=1000):
+        """Yield (sku, name, price, category, image_url) for every product without loading them all."""
+        conn = self.read_connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT sku, name, price, category, image_url FROM products ORDER BY id")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            conn.close()
+
+    def set_product_images(self, product_id, image_filename, thumbnail_filename, webp_filename):
+        """Record the resized variants of a product's image, unless the image has since been replaced."""
+        with self.connect() as conn:
+            conn.execute("UPDATE products SET thumbnail_url = ?, webp_url = ? WHERE id = ? AND image_url = ?",
+                         (thumbnail_filename, webp_filename, product_id, image_filename))
+        self._catalog_changed()
 
     def delete_product(self, product_id):
-        """Remove a product from the database."""
+        """Remove a product, its cart lines and its stock; past orders keep their lines, unlinked from it."""
         with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
             conn.commit()
+        self._catalog_changed()
 
     def create_order(self, user_id, total_price):
         """Insert a new order into the orders table and return the order ID."""
@@ -305,11 +469,200 @@ class DatabaseManager:
 
     def clear_cart(self, user_id):
         """Remove all items from the user's cart after order placement."""
+        if self.write_queue is not None:
+            self.write_queue.submit(user_id, CLEAR_CART_SQL, (user_id,),
+                                    on_commit=lambda: self.cart_summaries.pop(user_id))
+            return
         with self.connect() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
+            cursor.execute(CLEAR_CART_SQL, (user_id,))
             conn.commit()
+        self.cart_summaries.pop(user_id)
+
+    def get_sales_dashboard(self, days=30, top=10):
+        """Sales report for the last ``days`` days, read only from the daily rollup tables."""
+        since = f"-{int(days) - 1} days"
+        with self.read_connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''SELECT day, orders, revenue, units FROM daily_sales
+                              WHERE day >= date('now', ?) ORDER BY day''', (since,))
+            daily = [{"day": row[0], "orders": row[1], "revenue": round(row[2], 2), "units": row[3]}
+                     for row in cursor.fetchall()]
+
+            cursor.execute('''SELECT category, SUM(units), SUM(revenue) FROM daily_category_sales
+                              WHERE day >= date('now', ?) GROUP BY category ORDER BY SUM(revenue) DESC''', (since,))
+            categories = [{"category": row[0], "units": row[1], "revenue": round(row[2], 2)}
+                          for row in cursor.fetchall()]
+
+            cursor.execute('''SELECT daily_product_sales.product_id, products.name, SUM(units), SUM(revenue)
+                              FROM daily_product_sales
+                              LEFT JOIN products ON products.id = daily_product_sales.product_id
+                              WHERE day >= date('now', ?)
+                              GROUP BY daily_product_sales.product_id
+                              ORDER BY SUM(revenue) DESC LIMIT ?''', (since, top))
+            products = [{"product_id": row[0], "name": row[1], "units": row[2], "revenue": round(row[3], 2)}
+                        for row in cursor.fetchall()]
+
+            cursor.execute('''SELECT daily_user_orders.user_id, users.username, SUM(orders), SUM(revenue)
+                              FROM daily_user_orders
+                              LEFT JOIN users ON users.id = daily_user_orders.user_id
+                              WHERE day >= date('now', ?)
+                              GROUP BY daily_user_orders.user_id
+                              ORDER BY SUM(revenue) DESC LIMIT ?''', (since, top))
+            customers = [{"user_id": row[0], "username": row[1], "orders": row[2], "revenue": round(row[3], 2)}
+                         for row in cursor.fetchall()]
+
+        return {
+            "days": days,
+            "orders": sum(day["orders"] for day in daily),
+            "revenue": round(sum(day["revenue"] for day in daily), 2),
+            "units": sum(day["units"] for day in daily),
+            "daily": daily,
+            "categories": categories,
+            "top_products": products,
+            "top_customers": customers,
+        }
+
+    def set_stock(self, product_id, stock, stripes=1):
+        """Track a product's stock, split evenly over ``stripes`` rows; ``stock=None`` stops tracking it."""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM inventory WHERE product_id = ?", (product_id,))
+            if stock is not None:
+                share, extra = divmod(stock, stripes)
+                conn.executemany("INSERT INTO inventory (product_id, stripe, stock) VALUES (?, ?, ?)",
+                                 ((product_id, stripe, share + (stripe < extra)) for stripe in range(stripes)))
+
+    def get_stock(self, product_id):
+        """Units in stock and not reserved, or None if the product is not tracked."""
+        with self.read_connect() as conn:
+            return conn.execute("SELECT SUM(stock) FROM inventory WHERE product_id = ?", (product_id,)).fetchone()[0]
+
+    def reserve_and_add_to_cart(self, user_id, items, ttl=None):
+        """Reserve stock for (product_id, quantity) pairs and add them to the cart in one transaction.
+
+        All or nothing: raises OutOfStock if any product is short, or
+        IntegrityError for an unknown product, and then neither stock nor
+        cart changes.  Untracked products are added without a reservation;
+        if none of the products is tracked, the add goes through
+        add_many_to_cart() and so through the write-behind queue when it is
+        enabled.  Reservations last ``ttl`` seconds (reservation_ttl by
+        default), are renewed by further reservations of the same product
+        and go back to stock when the cart line is removed.
+        """
+        items = list(items)
+        with self.read_connect() as conn:
+            tracked = conn.execute(ANY_TRACKED_SQL, (json.dumps([product_id for product_id, _ in items]),)).fetchone()[0]
+        if not tracked:
+            return self.add_many_to_cart(user_id, items)
+
+        self._see_own_writes(user_id)
+        expires_at = time.time() + (self.reservation_ttl if ttl is None else ttl)
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for product_id, quantity in items:
+                if take_stock(cursor, product_id, quantity, user_id):
+                    cursor.execute(RESERVE_STOCK_SQL, (user_id, product_id, quantity, expires_at))
+                cursor.execute(ADD_TO_CART_SQL, (user_id, product_id, quantity))
+        self.cart_summaries.pop(user_id)
+
+    def release_expired_reservations(self, now=None):
+        """Return expired reservations to stock; returns how many products got units back."""
+        now = time.time() if now is None else now
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            expired = cursor.execute(EXPIRED_RESERVATIONS_SQL, (now,)).fetchall()
+            for product_id, quantity in expired:
+                return_stock(cursor, product_id, quantity)
+            cursor.execute("DELETE FROM stock_reservations WHERE expires_at < ?", (now,))
+        return len(expired)
+
+    def _settle_stock(self, cursor, user_id):
+        """Take the cart's tracked products out of stock, using the user's reservations first."""
+        reserved = dict(cursor.execute(USER_RESERVATIONS_SQL, (user_id,)).fetchall())
+        cursor.execute(TRACKED_CART_LINES_SQL, (user_id,))
+        for product_id, quantity in cursor.fetchall():
+            held = reserved.pop(product_id, 0)
+            if quantity > held:
+                take_stock(cursor, product_id, quantity - held, user_id)
+            elif held > quantity:
+                return_stock(cursor, product_id, held - quantity)
+        # Reserved products that left the cart
+        for product_id, held in reserved.items():
+            return_stock(cursor, product_id, held)
+        cursor.execute("DELETE FROM stock_reservations WHERE user_id = ?", (user_id,))
+
+    def checkout(self, user_id, max_retries=5, retry_delay=0.02):
+        """Turn the user's cart into an order in one transaction.
+
+        Returns the new order ID, or None if the cart is empty. Raises
+        OutOfStock, leaving the cart untouched, if a tracked product has too
+        few units. Retries with backoff when another writer holds the lock.
+        """
+        self._see_own_writes(user_id)
+        for attempt in range(max_retries + 1):
+            conn = self.connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(CART_TOTAL_SQL, (user_id,))
+                count, total_price = cursor.fetchone()
+                if not count:
+                    conn.rollback()
+                    return None
+
+                self._settle_stock(cursor, user_id)
+                cursor.execute("INSERT INTO orders (user_id, total_price) VALUES (?, ?)",
+                               (user_id, round(total_price, 2)))
+                order_id = cursor.lastrowid
+                cursor.execute(CHECKOUT_ITEMS_SQL, (order_id, user_id))
+                cursor.execute(CLEAR_CART_SQL, (user_id,))
+                conn.commit()
+                self.recommender.mark_dirty()
+                self.cart_summaries.pop(user_id)
+                return order_id
+            except OutOfStock:
+                conn.rollback()
+                raise
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if not _is_busy(e) or attempt == max_retries:
+                    raise
+            finally:
+                conn.close()
+            # Back off only after closing: this is the only writer connection
+            time.sleep(retry_delay * (2 ** attempt))
 
 if __name__ == "__main__":
-    db = DatabaseManager()
-    db.create_admin_user()
+    from catalog_io import FORMATS, guess_format, read_products, write_products
+
+    parser = argparse.ArgumentParser(description="Set up the database or bulk import/export the catalog.")
+    parser.add_argument("--db", default="ecommerce.db")
+    commands = parser.add_subparsers(dest="command")
+    import_parser = commands.add_parser("import", help="upsert products from a CSV or JSON Lines file, keyed by SKU")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument("--chunk-size", type=int, default=10000)
+    export_parser = commands.add_parser("export", help="write every product as CSV or JSON Lines")
+    export_parser.add_argument("file", nargs="?", help="defaults to stdout")
+    export_parser.add_argument("--format", choices=FORMATS, default="csv")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    if args.command == "import":
+        fmt = args.format or guess_format(args.file)
+        with open(args.file, encoding="utf-8-sig", newline="") as f:
+            count = db.import_products(read_products(f, fmt), args.chunk_size,
+                                       progress=lambda n: print(f"... {n} products", file=sys.stderr))
+        print(f"✅ Imported {count} products.")
+    elif args.command == "export":
+        out = open(args.file, "w", encoding="utf-8", newline="") if args.file else sys.stdout
+        try:
+            for chunk in write_products(db.iter_products(), args.format):
+                out.write(chunk)
+        finally:
+            if args.file:
+                out.close()
+    else:
+        db.create_admin_user()
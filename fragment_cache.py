@@ -0,0 +1,86 @@
+"""Cached HTML fragments and template warm-up.
+
+Product cards and the category list only change with the catalog, so they
+are rendered once per catalog version and kept in a bounded LRU.  Page
+templates call the ``product_card(product)`` and ``category_list(selected)``
+globals inside their per-user shell instead of repeating the markup.
+"""
+from flask import render_template
+from jinja2 import TemplateNotFound  # type: ignore
+from markupsafe import Markup  # type: ignore
+
+from ttl_cache import TTLCache
+
+PRODUCT_CARD_TEMPLATE = 'partials/product_card.html'
+CATEGORY_LIST_TEMPLATE = 'partials/category_list.html'
+
+
+class FragmentCache:
+    """Bounded LRU of rendered fragments keyed on (template, key, catalog version).
+
+    A catalog change bumps the version, so stale fragments are never served
+    and simply age out of the LRU.
+    """
+
+    def __init__(self, version_func, max_entries=4096, ttl=3600.0):
+        self.version_func = version_func
+        self._store = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._app = None
+        self._db = None
+
+    def render(self, template_name, key, **context):
+        """Return the cached fragment for ``key``, rendering ``template_name`` on a miss."""
+        cache_key = (template_name, key, self.version_func())
+        html = self._store.get(cache_key)
+        if html is None:
+            html = Markup(render_template(template_name, **context))
+            self._store.set(cache_key, html)
+        return html
+
+    def install(self, app, db):
+        """Register the product_card and category_list template globals."""
+        self._app = app
+        self._db = db
+
+        @app.template_global()
+        def product_card(product):
+            return self.render(PRODUCT_CARD_TEMPLATE, product[0], product=product)
+
+        @app.template_global()
+        def category_list(selected=None):
+            return self.render(CATEGORY_LIST_TEMPLATE, selected, selected=selected,
+                               categories=sorted(db.catalog.snapshot().by_category))
+
+    def warm(self, limit=500):
+        """Render every category list and the first ``limit`` product cards ahead of any request."""
+        snapshot = self._db.catalog.snapshot()
+        globals_ = self._app.jinja_env.globals
+        with self._app.test_request_context('/'):
+            for selected in ['all', *sorted(snapshot.by_category)]:
+                globals_['category_list'](selected)
+            for product in snapshot.products[:limit]:
+                globals_['product_card'](product)
+        return min(limit, len(snapshot.products))
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        return self._store.stats()
+
+
+def warm_templates(app):
+    """Load and compile every template now, so the first request does not pay for it.
+
+    Returns the names of the compiled templates.
+    """
+    env = app.jinja_env
+    names = env.list_templates()
+    compiled = []
+    for name in names:
+        try:
+            env.get_template(name)
+        except TemplateNotFound:
+            continue
+        compiled.append(name)
+    return compiled
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:  # variants are skipped without Pillow; originals are still served
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 16
+
+
+def is_content_hashed(filename):
+    """True for files named by ImagePipeline, whose contents never change."""
+    stem = os.path.basename(filename).split('.', 1)[0].split('_', 1)[0]
+    return len(stem) == HASH_LENGTH and all(c in '0123456789abcdef' for c in stem)
+
+
+class ImagePipeline:
+    """Stores product image uploads and builds smaller variants off the request thread.
+
+    Uploads are streamed to disk in chunks and named after a hash of their
+    contents, so re-uploading the same photo reuses the existing file and
+    every name can be cached forever.  A thumbnail and a full-size WebP copy
+    are then generated on a small thread pool and reported through
+    ``on_variants(product_id, image_filename, thumbnail_filename, webp_filename)``.
+    """
+
+    def __init__(self, folder, on_variants, max_workers=2, thumbnail_size=(400, 400),
+                 chunk_size=64 * 1024, quality=80):
+        self.folder = folder
+        self.on_variants = on_variants
+        self.thumbnail_size = thumbnail_size
+        self.chunk_size = chunk_size
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+
+    def save_upload(self, upload, filename):
+        """Stream an uploaded file to disk and return its content-hashed name."""
+        os.makedirs(self.folder, exist_ok=True)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = hashlib.sha256()
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = upload.stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            stored = digest.hexdigest()[:HASH_LENGTH] + extension
+            path = os.path.join(self.folder, stored)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return stored
+
+    def _variant_names(self, stored):
+        stem = os.path.splitext(stored)[0]
+        return stem + '_thumb.webp', stem + '.webp'
+
+    def _build_variants(self, product_id, stored):
+        thumbnail, webp = self._variant_names(stored)
+        thumbnail_path = os.path.join(self.folder, thumbnail)
+        webp_path = os.path.join(self.folder, webp)
+        try:
+            if not (os.path.exists(thumbnail_path) and os.path.exists(webp_path)):
+                with Image.open(os.path.join(self.folder, stored)) as original:
+                    original = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+                    original.save(webp_path + '.tmp', 'WEBP', quality=self.quality)
+                    original.thumbnail(self.thumbnail_size)
+                    original.save(thumbnail_path + '.tmp', 'WEBP', quality=self.quality)
+                os.replace(webp_path + '.tmp', webp_path)
+                os.replace(thumbnail_path + '.tmp', thumbnail_path)
+            self.on_variants(product_id, stored, thumbnail, webp)
+        except Exception:
+            logger.exception("Could not build image variants for product %s (%s)", product_id, stored)
+
+    def process(self, product_id, stored):
+        """Queue variant generation for a product's image; returns immediately."""
+        if Image is None:
+            logger.info("Pillow is not installed; serving %s without variants", stored)
+            return None
+        return self._executor.submit(self._build_variants, product_id, stored)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
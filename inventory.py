@@ -0,0 +1,97 @@
+"""Stock levels and cart reservations.
+
+Stock lives in the ``inventory`` table, one row per (product, stripe); a
+product without rows is not tracked and never runs out.  Units are only
+ever taken with ``UPDATE ... SET stock = stock - ? WHERE stock >= ?``, so a
+count can never go negative however many checkouts race for it.
+
+A popular product can be split over several stripes.  Each buyer starts
+at the stripe picked by their user ID, so concurrent buyers update
+different rows and only fall back to the other stripes when theirs runs
+dry.  SQLite still takes one database-wide write lock, so stripes mainly
+shorten each buyer's work on the shared rows rather than remove the lock.
+
+Adding to the cart can reserve units for a while (``stock_reservations``);
+checkout consumes the reservation, and ReservationSweeper hands expired
+ones back to stock.
+"""
+import logging
+import threading
+
+from queries import PRODUCT_STRIPES_SQL, RETURN_STOCK_SQL, TAKE_OWN_STRIPE_SQL
+
+logger = logging.getLogger(__name__)
+
+
+class OutOfStock(Exception):
+    """Raised when a product does not have enough units left."""
+
+    def __init__(self, product_id, requested):
+        super().__init__(f"not enough stock for product {product_id} ({requested} requested)")
+        self.product_id = product_id
+        self.requested = requested
+
+
+def take_stock(cursor, product_id, quantity, hint=0):
+    """Take ``quantity`` units of a product inside the caller's transaction.
+
+    Returns False if the product is not tracked, True once the units are
+    taken, and raises OutOfStock otherwise; the caller must then roll back,
+    since units may already have come out of some stripes.
+    """
+    # Fast path: the buyer's own stripe usually has enough
+    cursor.execute(TAKE_OWN_STRIPE_SQL, (quantity, product_id, hint, product_id, quantity))
+    if cursor.rowcount == 1:
+        return True
+
+    stripes = cursor.execute(PRODUCT_STRIPES_SQL, (product_id,)).fetchall()
+    if not stripes:
+        return False
+    needed = quantity
+    for stripe, stock in stripes:
+        take = min(needed, stock)
+        if take:
+            cursor.execute("UPDATE inventory SET stock = stock - ? WHERE product_id = ? AND stripe = ? AND stock >= ?",
+                           (take, product_id, stripe, take))
+            needed -= take * cursor.rowcount
+        if not needed:
+            return True
+    raise OutOfStock(product_id, quantity)
+
+
+def return_stock(cursor, product_id, quantity):
+    """Put units back, e.g. from an expired or unused reservation."""
+    cursor.execute(RETURN_STOCK_SQL, (quantity, product_id, product_id))
+
+
+class ReservationSweeper:
+    """Background thread that returns expired cart reservations to stock every ``interval`` seconds."""
+
+    def __init__(self, db, interval=30.0):
+        self.db = db
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="reservation-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                released = self.db.release_expired_reservations()
+                if released:
+                    logger.info("Returned %d expired reservation(s) to stock", released)
+            except Exception:
+                logger.exception("Reservation sweep failed")
+            finally:
+                self.db.release_connections()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
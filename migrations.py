@@ -0,0 +1,449 @@
+"""Versioned schema migrations for the e-commerce database.
+
+The schema version is stored in ``PRAGMA user_version``.  Each entry in
+MIGRATIONS moves the database up by one version and runs in its own
+``BEGIN IMMEDIATE`` transaction together with the version bump, so a
+migration either applies completely or not at all and readers on the WAL
+keep working while it runs.
+
+Run ``python migrations.py [db]`` to create or migrate a database and then
+check the query plans of the hot DatabaseManager queries.
+"""
+import re
+import sqlite3
+import sys
+
+import queries
+
+
+def create_base_tables(cursor):
+    """Create the tables that predate versioning; every migration builds on them."""
+    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
+                      id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      username TEXT UNIQUE NOT NULL,
+                      password TEXT NOT NULL,
+                      email TEXT,
+                      address TEXT,
+                      is_admin INTEGER DEFAULT 0)''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS products (
+                      id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      name TEXT NOT NULL,
+                      price REAL NOT NULL,
+                      category TEXT NOT NULL,
+                      image_url TEXT)''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS cart (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        product_id INTEGER NOT NULL,
+                        quantity INTEGER DEFAULT 1,
+                        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                        FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+                      ) ''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS orders (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        total_price REAL NOT NULL,
+                        date TEXT DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+                        )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS order_items (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        order_id INTEGER NOT NULL,
+                        product_id INTEGER NOT NULL,
+                        quantity INTEGER NOT NULL,
+                        price REAL NOT NULL,
+                        FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE,
+                        FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
+                    )''')
+
+
+def _add_indexes(cursor):
+    # Merge duplicate cart rows so the unique index can be built on old databases
+    cursor.execute('''UPDATE cart SET quantity = (
+                          SELECT SUM(c.quantity) FROM cart AS c
+                          WHERE c.user_id = cart.user_id AND c.product_id = cart.product_id)
+                      WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1)''')
+    cursor.execute('''DELETE FROM cart WHERE id NOT IN (
+                          SELECT MIN(id) FROM cart GROUP BY user_id, product_id)''')
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_user_product ON cart (user_id, product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cart_product ON cart (product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id)")
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_order_items_order
+                      ON order_items (order_id, product_id, quantity, price)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items (product_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)")
+
+
+def _add_cart_summary(cursor):
+    # Per-user item count and total kept in step with cart and price changes
+    cursor.execute('''CREATE TABLE IF NOT EXISTS cart_summary (
+                          user_id INTEGER PRIMARY KEY,
+                          item_count INTEGER NOT NULL DEFAULT 0,
+                          total_price REAL NOT NULL DEFAULT 0,
+                          version INTEGER NOT NULL DEFAULT 0,
+                          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+    cursor.execute('''INSERT OR REPLACE INTO cart_summary (user_id, item_count, total_price, version)
+                      SELECT cart.user_id, SUM(cart.quantity), SUM(cart.quantity * products.price), 1
+                      FROM cart JOIN products ON cart.product_id = products.id
+                      GROUP BY cart.user_id''')
+
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS cart_summary_insert AFTER INSERT ON cart BEGIN
+                          INSERT INTO cart_summary (user_id, item_count, total_price, version)
+                          VALUES (NEW.user_id, NEW.quantity,
+                                  NEW.quantity * (SELECT price FROM products WHERE id = NEW.product_id), 1)
+                          ON CONFLICT(user_id) DO UPDATE SET
+                              item_count = item_count + excluded.item_count,
+                              total_price = total_price + excluded.total_price,
+                              version = version + 1;
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS cart_summary_delete AFTER DELETE ON cart BEGIN
+                          UPDATE cart_summary SET
+                              item_count = item_count - OLD.quantity,
+                              total_price = CASE WHEN item_count - OLD.quantity <= 0 THEN 0
+                                  ELSE total_price - OLD.quantity * (SELECT price FROM products WHERE id = OLD.product_id) END,
+                              version = version + 1
+                          WHERE user_id = OLD.user_id;
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS cart_summary_update AFTER UPDATE OF user_id, product_id, quantity ON cart BEGIN
+                          UPDATE cart_summary SET
+                              item_count = item_count - OLD.quantity,
+                              total_price = CASE WHEN item_count - OLD.quantity <= 0 THEN 0
+                                  ELSE total_price - OLD.quantity * (SELECT price FROM products WHERE id = OLD.product_id) END,
+                              version = version + 1
+                          WHERE user_id = OLD.user_id;
+                          INSERT INTO cart_summary (user_id, item_count, total_price, version)
+                          VALUES (NEW.user_id, NEW.quantity,
+                                  NEW.quantity * (SELECT price FROM products WHERE id = NEW.product_id), 1)
+                          ON CONFLICT(user_id) DO UPDATE SET
+                              item_count = item_count + excluded.item_count,
+                              total_price = total_price + excluded.total_price,
+                              version = version + 1;
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS cart_summary_price AFTER UPDATE OF price ON products
+                      WHEN NEW.price IS NOT OLD.price BEGIN
+                          UPDATE cart_summary SET
+                              total_price = total_price + (NEW.price - OLD.price) * (
+                                  SELECT SUM(quantity) FROM cart
+                                  WHERE cart.product_id = NEW.id AND cart.user_id = cart_summary.user_id),
+                              version = version + 1
+                          WHERE user_id IN (SELECT user_id FROM cart WHERE product_id = NEW.id);
+                      END''')
+    # Empty carts before the product row goes, so cart_summary_delete can still see its price
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS cart_summary_product_delete BEFORE DELETE ON products BEGIN
+                          DELETE FROM cart WHERE product_id = OLD.id;
+                      END''')
+
+
+def _add_image_variants(cursor):
+    # Resized copies built by the image pipeline; NULL until they exist
+    cursor.execute("ALTER TABLE products ADD COLUMN thumbnail_url TEXT")
+    cursor.execute("ALTER TABLE products ADD COLUMN webp_url TEXT")
+
+
+def _add_product_search(cursor):
+    # Full-text index over name and category, kept in sync by triggers
+    cursor.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                          name, category,
+                          content='products', content_rowid='id',
+                          tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                          INSERT INTO products_fts (rowid, name, category) VALUES (NEW.id, NEW.name, NEW.category);
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                          INSERT INTO products_fts (products_fts, rowid, name, category)
+                          VALUES ('delete', OLD.id, OLD.name, OLD.category);
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, category ON products BEGIN
+                          INSERT INTO products_fts (products_fts, rowid, name, category)
+                          VALUES ('delete', OLD.id, OLD.name, OLD.category);
+                          INSERT INTO products_fts (rowid, name, category) VALUES (NEW.id, NEW.name, NEW.category);
+                      END''')
+
+
+def _add_product_sku(cursor):
+    # Supplier SKU used as the upsert key for bulk imports; NULL for hand-added products
+    cursor.execute("ALTER TABLE products ADD COLUMN sku TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products (sku)")
+
+
+def _add_sessions(cursor):
+    # Server-side session data shared by every worker process
+    cursor.execute('''CREATE TABLE IF NOT EXISTS sessions (
+                          id TEXT PRIMARY KEY,
+                          data TEXT NOT NULL,
+                          expires_at REAL NOT NULL)''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+
+
+def _add_sales_rollups(cursor):
+    # Daily sales totals maintained by triggers, so reports never scan orders
+    cursor.execute('''CREATE TABLE IF NOT EXISTS daily_sales (
+                          day TEXT PRIMARY KEY,
+                          orders INTEGER NOT NULL DEFAULT 0,
+                          revenue REAL NOT NULL DEFAULT 0,
+                          units INTEGER NOT NULL DEFAULT 0)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS daily_product_sales (
+                          day TEXT NOT NULL,
+                          product_id INTEGER NOT NULL,
+                          units INTEGER NOT NULL DEFAULT 0,
+                          revenue REAL NOT NULL DEFAULT 0,
+                          PRIMARY KEY (day, product_id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS daily_category_sales (
+                          day TEXT NOT NULL,
+                          category TEXT NOT NULL,
+                          units INTEGER NOT NULL DEFAULT 0,
+                          revenue REAL NOT NULL DEFAULT 0,
+                          PRIMARY KEY (day, category))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS daily_user_orders (
+                          day TEXT NOT NULL,
+                          user_id INTEGER NOT NULL,
+                          orders INTEGER NOT NULL DEFAULT 0,
+                          revenue REAL NOT NULL DEFAULT 0,
+                          PRIMARY KEY (day, user_id))''')
+
+    # Backfill from existing orders ("WHERE true" lets the upsert parse after a SELECT)
+    cursor.execute('''INSERT INTO daily_sales (day, orders, revenue)
+                      SELECT date(date), COUNT(*), SUM(total_price) FROM orders WHERE true GROUP BY date(date)
+                      ON CONFLICT(day) DO NOTHING''')
+    cursor.execute('''INSERT INTO daily_user_orders (day, user_id, orders, revenue)
+                      SELECT date(date), user_id, COUNT(*), SUM(total_price) FROM orders WHERE true
+                      GROUP BY date(date), user_id
+                      ON CONFLICT(day, user_id) DO NOTHING''')
+    cursor.execute('''INSERT INTO daily_product_sales (day, product_id, units, revenue)
+                      SELECT date(orders.date), order_items.product_id, SUM(order_items.quantity),
+                             SUM(order_items.quantity * order_items.price)
+                      FROM order_items JOIN orders ON orders.id = order_items.order_id WHERE true
+                      GROUP BY date(orders.date), order_items.product_id
+                      ON CONFLICT(day, product_id) DO NOTHING''')
+    cursor.execute('''INSERT INTO daily_category_sales (day, category, units, revenue)
+                      SELECT date(orders.date), products.category, SUM(order_items.quantity),
+                             SUM(order_items.quantity * order_items.price)
+                      FROM order_items
+                      JOIN orders ON orders.id = order_items.order_id
+                      JOIN products ON products.id = order_items.product_id WHERE true
+                      GROUP BY date(orders.date), products.category
+                      ON CONFLICT(day, category) DO NOTHING''')
+    cursor.execute('''UPDATE daily_sales SET units = COALESCE((
+                          SELECT SUM(units) FROM daily_product_sales WHERE daily_product_sales.day = daily_sales.day), 0)''')
+
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS sales_rollup_order AFTER INSERT ON orders BEGIN
+                          INSERT INTO daily_sales (day, orders, revenue) VALUES (date(NEW.date), 1, NEW.total_price)
+                          ON CONFLICT(day) DO UPDATE SET orders = orders + 1, revenue = revenue + excluded.revenue;
+                          INSERT INTO daily_user_orders (day, user_id, orders, revenue)
+                          VALUES (date(NEW.date), NEW.user_id, 1, NEW.total_price)
+                          ON CONFLICT(day, user_id) DO UPDATE SET
+                              orders = orders + 1, revenue = revenue + excluded.revenue;
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS sales_rollup_item AFTER INSERT ON order_items BEGIN
+                          INSERT INTO daily_product_sales (day, product_id, units, revenue)
+                          VALUES ((SELECT date(date) FROM orders WHERE id = NEW.order_id), NEW.product_id,
+                                  NEW.quantity, NEW.quantity * NEW.price)
+                          ON CONFLICT(day, product_id) DO UPDATE SET
+                              units = units + excluded.units, revenue = revenue + excluded.revenue;
+                          INSERT INTO daily_category_sales (day, category, units, revenue)
+                          VALUES ((SELECT date(date) FROM orders WHERE id = NEW.order_id),
+                                  (SELECT category FROM products WHERE id = NEW.product_id),
+                                  NEW.quantity, NEW.quantity * NEW.price)
+                          ON CONFLICT(day, category) DO UPDATE SET
+                              units = units + excluded.units, revenue = revenue + excluded.revenue;
+                          UPDATE daily_sales SET units = units + NEW.quantity
+                          WHERE day = (SELECT date(date) FROM orders WHERE id = NEW.order_id);
+                      END''')
+
+
+def _add_inventory(cursor):
+    # Products without inventory rows are untracked; popular ones may be split over stripes 0..n-1
+    cursor.execute('''CREATE TABLE IF NOT EXISTS inventory (
+                          product_id INTEGER NOT NULL,
+                          stripe INTEGER NOT NULL DEFAULT 0,
+                          stock INTEGER NOT NULL CHECK (stock >= 0),
+                          PRIMARY KEY (product_id, stripe),
+                          FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE) WITHOUT ROWID''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS stock_reservations (
+                          user_id INTEGER NOT NULL,
+                          product_id INTEGER NOT NULL,
+                          quantity INTEGER NOT NULL,
+                          expires_at REAL NOT NULL,
+                          PRIMARY KEY (user_id, product_id),
+                          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                          FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE) WITHOUT ROWID''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_reservations_expiry ON stock_reservations (expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_reservations_product ON stock_reservations (product_id)")
+
+
+def _release_reservations_on_cart_delete(cursor):
+    # Removing a cart line, by any path, hands its reservation back to stock.
+    # Checkout deletes the reservations before the cart, so sold units stay sold.
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS stock_reservation_release AFTER DELETE ON cart
+                      WHEN EXISTS (SELECT 1 FROM stock_reservations
+                                   WHERE user_id = OLD.user_id AND product_id = OLD.product_id)
+                      BEGIN
+                          UPDATE inventory SET stock = stock + (
+                              SELECT quantity FROM stock_reservations
+                              WHERE user_id = OLD.user_id AND product_id = OLD.product_id)
+                          WHERE product_id = OLD.product_id
+                          AND stripe = (SELECT MIN(stripe) FROM inventory WHERE product_id = OLD.product_id);
+                          DELETE FROM stock_reservations WHERE user_id = OLD.user_id AND product_id = OLD.product_id;
+                      END''')
+
+
+def _keep_order_items_on_product_delete(cursor):
+    # With foreign keys enforced, ON DELETE CASCADE made deleting a product erase it from past
+    # orders.  SQLite cannot alter a foreign key, so rebuild order_items with ON DELETE SET NULL,
+    # keeping its rows, IDs, indexes and triggers.
+    schema = [row[0] for row in cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'order_items' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL")]
+    cursor.execute('''CREATE TABLE order_items_new (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          order_id INTEGER NOT NULL,
+                          product_id INTEGER,
+                          quantity INTEGER NOT NULL,
+                          price REAL NOT NULL,
+                          FOREIGN KEY(order_id) REFERENCES orders(id) ON DELETE CASCADE,
+                          FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE SET NULL)''')
+    # Lines whose product was deleted while foreign keys were off point nowhere; unlink them too
+    cursor.execute('''INSERT INTO order_items_new (id, order_id, product_id, quantity, price)
+                      SELECT order_items.id, order_items.order_id, products.id, order_items.quantity, order_items.price
+                      FROM order_items LEFT JOIN products ON products.id = order_items.product_id''')
+    cursor.execute('''UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM sqlite_sequence WHERE name = 'order_items'))
+                      WHERE name = 'order_items_new' ''')
+    cursor.execute("DROP TABLE order_items")
+    cursor.execute("ALTER TABLE order_items_new RENAME TO order_items")
+    for sql in schema:
+        cursor.execute(sql)
+
+
+# Append new migrations here; never edit or reorder ones that have shipped.
+MIGRATIONS = [
+    _add_indexes,
+    _add_cart_summary,
+    _add_image_variants,
+    _add_product_search,
+    _add_product_sku,
+    _add_sessions,
+    _add_sales_rollups,
+    _add_inventory,
+    _release_reservations_on_cart_delete,
+    _keep_order_items_on_product_delete,
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Bring the database up to the latest schema version.
+
+    Returns the number of migrations applied.
+    """
+    applied = 0
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if schema_version(conn) >= version:
+            continue
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if schema_version(conn) < version:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                applied += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+
+# Queries that must be answered with an index; (name, sql, sample parameters).
+# The SQL is the text DatabaseManager runs, so the check cannot drift from it.
+HOT_QUERIES = [
+    ("get_product_by_id", queries.PRODUCT_BY_ID_SQL, (1,)),
+    ("search_products", queries.SEARCH_PRODUCTS_SQL, ('"lap"*', 20, 0)),
+    ("recommendations_co_purchases", queries.CO_PURCHASES_SQL, (0, 100)),
+    ("recommendations_units_sold", queries.UNITS_SOLD_SQL, (0, 100)),
+    ("get_cart_items", queries.CART_ITEMS_SQL, (1,)),
+    ("add_to_cart", queries.ADD_TO_CART_SQL, (1, 1, 1)),
+    ("remove_from_cart", queries.REMOVE_FROM_CART_SQL, (1, 1)),
+    ("clear_cart", queries.CLEAR_CART_SQL, (1,)),
+    ("get_cart_summary", queries.CART_SUMMARY_SQL, (1,)),
+    ("get_user", queries.USER_BY_NAME_SQL, ("admin",)),
+    ("get_user_details", queries.USER_DETAILS_SQL, (1,)),
+    ("load_session", queries.LOAD_SESSION_SQL, ("x", 0)),
+    ("get_user_orders", queries.USER_ORDERS_SQL.format(keyset=""), (1, 20)),
+    ("get_user_orders_next_page", queries.USER_ORDERS_SQL.format(keyset="AND id < ?"), (1, 1000, 20)),
+    ("checkout_total", queries.CART_TOTAL_SQL, (1,)),
+    ("checkout_items", queries.CHECKOUT_ITEMS_SQL, (0, 1)),
+    ("any_tracked", queries.ANY_TRACKED_SQL, ("[1, 2]",)),
+    ("take_stock", queries.TAKE_OWN_STRIPE_SQL, (1, 1, 0, 1, 1)),
+    ("take_stock_stripes", queries.PRODUCT_STRIPES_SQL, (1,)),
+    ("return_stock", queries.RETURN_STOCK_SQL, (1, 1, 1)),
+    ("reserve_stock", queries.RESERVE_STOCK_SQL, (1, 1, 1, 0)),
+    ("checkout_reservations", queries.USER_RESERVATIONS_SQL, (1,)),
+    ("checkout_tracked_lines", queries.TRACKED_CART_LINES_SQL, (1,)),
+    ("release_expired_reservations", queries.EXPIRED_RESERVATIONS_SQL, (0,)),
+]
+
+# A word after FROM/JOIN that is one of these is not a table name or alias
+_NOT_A_NAME = r"(?!(?:ON|WHERE|JOIN|LEFT|INNER|CROSS|NATURAL|GROUP|ORDER|LIMIT|SET|VALUES|SELECT|INDEXED|NOT|USING|AND)\b)"
+_TABLE_REFERENCE = re.compile(rf"\b(?:FROM|JOIN|UPDATE|INTO)\s+{_NOT_A_NAME}(\w+)(?:\s+(?:AS\s+)?{_NOT_A_NAME}(\w+))?",
+                              re.IGNORECASE)
+
+
+def _aliases(sql):
+    """Map every table name and alias in ``sql`` to the table it stands for."""
+    names = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        names[table] = table
+        if alias:
+            names[alias] = table
+    return names
+
+
+def find_table_scans(conn, checks=None):
+    """Run EXPLAIN QUERY PLAN over the hot queries and report full scans.
+
+    Returns a list of (query name, plan detail) for every step that scans a
+    real table, under its own name or an alias, instead of searching an
+    index.  Walking a whole index (``SCAN x USING INDEX``) counts as a scan.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    scans = []
+    for name, sql, params in HOT_QUERIES if checks is None else checks:
+        names = _aliases(sql)
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[-1]
+            words = detail.split()
+            if len(words) < 2 or words[0] != "SCAN":
+                continue
+            # Older SQLite versions say "SCAN TABLE x AS a"
+            target = words[4] if words[1] == "TABLE" and len(words) >= 5 and words[3] == "AS" else \
+                words[2] if words[1] == "TABLE" else words[1]
+            # Virtual tables such as the FTS index do their own lookups
+            if names.get(target, target) in tables and "VIRTUAL TABLE" not in detail:
+                scans.append((name, detail))
+    return scans
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "ecommerce.db")
+    create_base_tables(conn.cursor())
+    conn.commit()
+    applied = apply_migrations(conn)
+    print(f"Schema at version {schema_version(conn)} ({applied} migration(s) applied)")
+
+    scans = find_table_scans(conn)
+    for name, detail in scans:
+        print(f"❌ {name}: {detail}")
+    conn.close()
+    if scans:
+        sys.exit(1)
+    print("✅ All hot queries use an index.")
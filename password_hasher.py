@@ -0,0 +1,157 @@
+"""Password hashing off the request thread, plus per-user login throttling.
+
+PBKDF2 and scrypt are CPU-bound and hold the GIL, so hashing inline lets a
+burst of logins stall every other request in the process.  PasswordHasher
+runs the work in a small process pool instead and refuses new work once
+that pool is saturated, which keeps the web threads free to serve pages.
+"""
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash  # type: ignore
+
+# Whatever werkzeug itself defaults to (scrypt at the time of writing)
+DEFAULT_METHOD = inspect.signature(generate_password_hash).parameters["method"].default
+
+
+def password_method():
+    """The configured hashing method, e.g. ``scrypt``, ``scrypt:65536:8:1`` or ``pbkdf2:sha256:1000000``."""
+    return os.environ.get("ECOMMERCE_PASSWORD_METHOD", DEFAULT_METHOD)
+
+
+def _cost(method):
+    """Split a werkzeug method into its algorithm and cost parameters, filling in werkzeug's defaults."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        defaults = [2 ** 15, 8, 1]
+        return name, tuple(int(arg) for arg in args + defaults[len(args):])
+    if name == "pbkdf2":
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{args[0] if args else 'sha256'}", (iterations,)
+    return method, ()
+
+
+class HasherBusy(Exception):
+    """Raised when the process pool cannot take or finish a hash within the timeout."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded process pool.
+
+    At most ``max_workers`` hashes run at once and at most ``max_pending``
+    are in flight; callers wait up to ``timeout`` seconds for a slot, and
+    as long again for the result, and then get HasherBusy.
+    ``max_workers=0`` hashes inline on the calling thread.
+
+    Workers are started with ``spawn``: the web process already runs
+    other threads, and forking it could copy a lock one of them holds.
+    """
+
+    def __init__(self, method=None, max_workers=2, max_pending=None, timeout=5.0):
+        self.method = method or password_method()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, max_workers) * 4)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Started on first use so importing the app does not start processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self.max_workers:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy("password hashing is saturated")
+        try:
+            future = self._pool().submit(func, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise HasherBusy("password hash did not finish in time") from None
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with another algorithm or a lower cost than the configured one.
+
+        A hash that is already costlier than the configuration is kept, so
+        lowering the cost never weakens stored passwords.
+        """
+        stored, stored_cost = _cost(pwhash.split("$", 1)[0])
+        wanted, wanted_cost = _cost(self.method)
+        return stored != wanted or any(have < want for have, want in zip(stored_cost, wanted_cost))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class LoginThrottle:
+    """Sliding-window limit on failed logins per username, kept in process memory.
+
+    After ``max_failures`` failures within ``window`` seconds the username
+    is locked out until the oldest failure ages out.  Checked before any
+    hashing, so guessing at one account cannot tie up the process pool.
+    """
+
+    def __init__(self, max_failures=5, window=300.0, max_entries=100000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_entries = max_entries
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may try again, or 0 if it is not locked out."""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if failures is None or len(failures) < self.max_failures:
+                return 0
+            return max(1, int(failures[0] + self.window - now) + 1)
+
+    def failed(self, key):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if failures is None:
+                if len(self._failures) >= self.max_entries:
+                    # Forget the oldest username rather than grow without bound
+                    self._failures.pop(next(iter(self._failures)))
+                failures = self._failures[key] = deque(maxlen=self.max_failures)
+            failures.append(now)
+
+    def succeeded(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
@@ -0,0 +1,338 @@
+"""Opt-in per-request profiling for DatabaseManager and the Flask routes.
+
+Nothing here is active until Profiler.install() is called; until then the
+database manager and the app run completely unpatched.  Once installed,
+every DatabaseManager method and every request records:
+
+* the number of SQL statements and the time spent executing and fetching,
+* the time spent checking connections out of the pool,
+* the number of rows returned,
+* the remaining Python time inside DatabaseManager (mostly building dicts),
+* the time spent rendering each template.
+
+Each response gets a Server-Timing header, totals are served in the
+Prometheus text format on /metrics, and statements slower than the
+threshold are logged together with their EXPLAIN QUERY PLAN.
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('profile', default=None)
+
+
+class Profile:
+    """Counters for one request (or one unscoped DatabaseManager call)."""
+
+    __slots__ = ('started', 'queries', 'sql_time', 'conn_time', 'rows', 'db_time', 'db_calls', 'depth',
+                 'render_time', 'render_starts')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.conn_time = 0.0
+        self.rows = 0
+        self.db_time = 0.0
+        self.db_calls = 0
+        self.depth = 0
+        self.render_time = 0.0
+        self.render_starts = []
+
+    @property
+    def python_time(self):
+        """Time inside DatabaseManager methods not spent in SQLite or the pool."""
+        return max(0.0, self.db_time - self.sql_time - self.conn_time)
+
+
+class TracingCursor:
+    def __init__(self, cursor, profiler, raw_conn):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._raw_conn = raw_conn
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, sql, params, func, *args):
+        started = time.perf_counter()
+        try:
+            func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._profiler.record_query(sql, params, elapsed, self._raw_conn)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._timed(sql, params, self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._timed(sql, None, self._cursor.executemany, sql, seq_of_params)
+
+    def _fetch(self, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        rows = 0 if result is None else (len(result) if isinstance(result, list) else 1)
+        self._profiler.record_fetch(time.perf_counter() - started, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+class TracingConnection:
+    def __init__(self, conn, profiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def cursor(self):
+        return TracingCursor(self._conn.cursor(), self._profiler, self._conn._raw)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class Profiler:
+    def __init__(self, slow_query_ms=100.0):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._methods = defaultdict(lambda: [0, 0.0])
+        self._routes = defaultdict(lambda: [0, 0.0])
+        self._templates = defaultdict(lambda: [0, 0.0])
+        self._totals = defaultdict(float)
+        self._db = None
+        self._fragments = None
+
+    # Recording
+
+    def _profile(self):
+        profile = _current.get()
+        if profile is None:
+            # Calls outside a request still count towards the totals
+            profile = Profile()
+        return profile
+
+    def record_query(self, sql, params, elapsed, raw_conn):
+        profile = self._profile()
+        profile.queries += 1
+        profile.sql_time += elapsed
+        with self._lock:
+            self._totals['queries'] += 1
+            self._totals['sql_seconds'] += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            self._log_slow_query(sql, params, elapsed, raw_conn)
+
+    def record_fetch(self, elapsed, rows):
+        profile = self._profile()
+        profile.sql_time += elapsed
+        profile.rows += rows
+        with self._lock:
+            self._totals['sql_seconds'] += elapsed
+            self._totals['rows'] += rows
+
+    def _log_slow_query(self, sql, params, elapsed, raw_conn):
+        with self._lock:
+            self._totals['slow_queries'] += 1
+        plan = ''
+        if params is not None and not sql.lstrip().upper().startswith(('BEGIN', 'COMMIT', 'PRAGMA')):
+            try:
+                plan = '\n'.join(row[-1] for row in raw_conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+            except Exception as e:
+                plan = f'(no plan: {e})'
+        logger.warning('Slow query (%.1f ms): %s\n%s', elapsed * 1000, ' '.join(sql.split()), plan)
+
+    # DatabaseManager instrumentation
+
+    def instrument_db(self, db):
+        """Wrap the public methods and connections of a DatabaseManager instance."""
+        self._db = db
+        db.connect = self._trace_connect(db.connect)
+        db.read_connect = self._trace_connect(db.read_connect)
+
+        for name in dir(type(db)):
+            if name.startswith('_') or name in ('connect', 'read_connect', 'close', 'release_connections', 'pool_stats'):
+                continue
+            method = getattr(db, name)
+            if callable(method):
+                setattr(db, name, self._wrap_method(name, method))
+
+    def _trace_connect(self, connect):
+        def traced_connect():
+            started = time.perf_counter()
+            conn = connect()
+            elapsed = time.perf_counter() - started
+            self._profile().conn_time += elapsed
+            with self._lock:
+                self._totals['conn_seconds'] += elapsed
+            return TracingConnection(conn, self)
+        return traced_connect
+
+    def _wrap_method(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is not None:
+                profile.depth += 1
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    stats = self._methods[name]
+                    stats[0] += 1
+                    stats[1] += elapsed
+                # Only the outermost call counts towards the request, so nested calls are not added twice
+                if profile is not None:
+                    profile.depth -= 1
+                    if profile.depth == 0:
+                        profile.db_calls += 1
+                        profile.db_time += elapsed
+        return wrapper
+
+    # Template rendering
+
+    def _render_started(self, sender, template, context, **extra):
+        profile = _current.get()
+        if profile is not None:
+            profile.render_starts.append(time.perf_counter())
+
+    def _render_finished(self, sender, template, context, **extra):
+        profile = _current.get()
+        if profile is None or not profile.render_starts:
+            return
+        elapsed = time.perf_counter() - profile.render_starts.pop()
+        # Times include nested renders (fragments); only the outermost counts towards the request
+        if not profile.render_starts:
+            profile.render_time += elapsed
+        with self._lock:
+            stats = self._templates[template.name or 'string']
+            stats[0] += 1
+            stats[1] += elapsed
+
+    # Flask integration
+
+    def install(self, app, db, fragments=None):
+        """Instrument ``db`` and add timing hooks and /metrics to ``app``."""
+        from flask import Response, before_render_template, request, template_rendered
+
+        self.instrument_db(db)
+        self._fragments = fragments
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+
+        @app.before_request
+        def start_profile():
+            _current.set(Profile())
+
+        @app.after_request
+        def finish_profile(response):
+            profile = _current.get()
+            if profile is None:
+                return response
+            total = time.perf_counter() - profile.started
+            with self._lock:
+                stats = self._routes[(request.endpoint or 'unknown', request.method, response.status_code)]
+                stats[0] += 1
+                stats[1] += total
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={profile.sql_time * 1000:.2f};desc="{profile.queries} queries, {profile.rows} rows"',
+                f'conn;dur={profile.conn_time * 1000:.2f}',
+                f'py;dur={profile.python_time * 1000:.2f}',
+                f'render;dur={profile.render_time * 1000:.2f}',
+                f'total;dur={total * 1000:.2f}',
+            ])
+            return response
+
+        @app.teardown_request
+        def clear_profile(exception=None):
+            _current.set(None)
+
+        app.add_url_rule('/metrics', 'metrics', lambda: Response(self.render_metrics(), mimetype='text/plain; version=0.0.4'))
+
+    def render_metrics(self):
+        """Render the collected totals in the Prometheus text format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        with self._lock:
+            totals = dict(self._totals)
+            methods = {name: list(stats) for name, stats in self._methods.items()}
+            routes = {key: list(stats) for key, stats in self._routes.items()}
+            templates = {name: list(stats) for name, stats in self._templates.items()}
+
+        metric('ecommerce_sql_queries_total', 'counter', 'SQL statements executed.', [({}, int(totals.get('queries', 0)))])
+        metric('ecommerce_sql_seconds_total', 'counter', 'Time spent executing and fetching SQL.', [({}, totals.get('sql_seconds', 0.0))])
+        metric('ecommerce_sql_rows_total', 'counter', 'Rows returned by SQL statements.', [({}, int(totals.get('rows', 0)))])
+        metric('ecommerce_sql_slow_queries_total', 'counter', 'Statements slower than the slow query threshold.',
+               [({}, int(totals.get('slow_queries', 0)))])
+        metric('ecommerce_db_connect_seconds_total', 'counter', 'Time spent checking connections out of the pool.',
+               [({}, totals.get('conn_seconds', 0.0))])
+        metric('ecommerce_db_calls_total', 'counter', 'DatabaseManager method calls.',
+               [({'method': name}, stats[0]) for name, stats in sorted(methods.items())])
+        metric('ecommerce_db_call_seconds_total', 'counter', 'Time spent in DatabaseManager methods.',
+               [({'method': name}, stats[1]) for name, stats in sorted(methods.items())])
+        metric('ecommerce_http_requests_total', 'counter', 'HTTP requests handled.',
+               [({'endpoint': e, 'method': m, 'status': s}, stats[0]) for (e, m, s), stats in sorted(routes.items())])
+        metric('ecommerce_http_request_seconds_total', 'counter', 'Time spent handling HTTP requests.',
+               [({'endpoint': e, 'method': m, 'status': s}, stats[1]) for (e, m, s), stats in sorted(routes.items())])
+        metric('ecommerce_template_renders_total', 'counter', 'Templates rendered, fragments included.',
+               [({'template': name}, stats[0]) for name, stats in sorted(templates.items())])
+        metric('ecommerce_template_render_seconds_total', 'counter', 'Time spent rendering each template.',
+               [({'template': name}, stats[1]) for name, stats in sorted(templates.items())])
+
+        if self._db is not None:
+            pools = self._db.pool_stats()
+            metric('ecommerce_pool_connections', 'gauge', 'Connections in the pool by state.',
+                   [({'pool': name, 'state': state}, stats[state])
+                    for name, stats in pools.items() for state in ('in_use', 'idle')])
+            metric('ecommerce_pool_connections_created_total', 'counter', 'Connections opened by the pool.',
+                   [({'pool': name}, stats['created']) for name, stats in pools.items()])
+            metric('ecommerce_pool_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.',
+                   [({'pool': name}, stats['wait_time_total']) for name, stats in pools.items()])
+            catalog = self._db.catalog.stats()
+            metric('ecommerce_catalog_cache_requests_total', 'counter', 'Catalog cache lookups.',
+                   [({'result': 'hit'}, catalog['hits']), ({'result': 'miss'}, catalog['misses'])])
+        if self._fragments is not None:
+            fragments = self._fragments.stats()
+            metric('ecommerce_fragment_cache_requests_total', 'counter', 'Fragment cache lookups.',
+                   [({'result': 'hit'}, fragments['hits']), ({'result': 'miss'}, fragments['misses'])])
+
+        return '\n'.join(lines) + '\n'
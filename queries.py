@@ -0,0 +1,126 @@
+"""SQL run on the hot paths.
+
+DatabaseManager and its helpers execute these statements, and the plan
+check in migrations.py explains the very same text, so an index the
+queries rely on cannot go missing unnoticed.
+"""
+
+# Column order of a Product row
+PRODUCT_COLUMNS = "products.id, products.name, products.price, products.category, products.image_url, " \
+                  "products.thumbnail_url, products.webp_url, products.sku"
+
+ALL_PRODUCTS_SQL = f"SELECT {PRODUCT_COLUMNS} FROM products"
+
+PRODUCT_BY_ID_SQL = f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id = ?"
+
+SEARCH_PRODUCTS_SQL = f'''
+    SELECT {PRODUCT_COLUMNS} FROM products_fts
+    JOIN products ON products.id = products_fts.rowid
+    WHERE products_fts MATCH ?
+    ORDER BY bm25(products_fts, 10.0, 2.0)
+    LIMIT ? OFFSET ?
+'''
+
+CO_PURCHASES_SQL = '''
+    SELECT a.product_id, b.product_id, COUNT(*)
+    FROM order_items AS a
+    JOIN order_items AS b ON b.order_id = a.order_id AND b.product_id != a.product_id
+    WHERE a.order_id > ? AND a.order_id <= ?
+    GROUP BY a.product_id, b.product_id
+'''
+
+UNITS_SOLD_SQL = '''
+    SELECT product_id, SUM(quantity) FROM order_items
+    WHERE order_id > ? AND order_id <= ?
+    GROUP BY product_id
+'''
+
+CART_ITEMS_SQL = '''
+    SELECT cart.id, products.name, products.price, cart.quantity, products.image_url, products.id
+    FROM cart
+    JOIN products ON cart.product_id = products.id
+    WHERE cart.user_id = ?
+'''
+
+ADD_TO_CART_SQL = """
+    INSERT INTO cart (user_id, product_id, quantity) VALUES (?, ?, ?)
+    ON CONFLICT(user_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+"""
+
+REMOVE_FROM_CART_SQL = "DELETE FROM cart WHERE id = ? AND user_id = ?"
+
+CLEAR_CART_SQL = "DELETE FROM cart WHERE user_id = ?"
+
+CART_SUMMARY_SQL = "SELECT item_count, total_price, version FROM cart_summary WHERE user_id = ?"
+
+USER_BY_NAME_SQL = "SELECT id, username, password, is_admin FROM users WHERE username = ?"
+
+USER_DETAILS_SQL = "SELECT username, email, address FROM users WHERE id = ?"
+
+LOAD_SESSION_SQL = "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at >= ?"
+
+# {keyset} is empty for the first page and "AND id < ?" after it
+USER_ORDERS_SQL = """
+    SELECT o.id, o.total_price, o.date,
+           order_items.id, products.name, order_items.quantity, order_items.price, products.image_url
+    FROM (
+        SELECT id, total_price, date FROM orders
+        WHERE user_id = ? {keyset}
+        ORDER BY id DESC
+        LIMIT ?
+    ) AS o
+    LEFT JOIN order_items ON order_items.order_id = o.id
+    LEFT JOIN products ON order_items.product_id = products.id
+    ORDER BY o.id DESC, order_items.id
+"""
+
+CART_TOTAL_SQL = '''
+    SELECT COUNT(*), SUM(products.price * cart.quantity)
+    FROM cart
+    JOIN products ON cart.product_id = products.id
+    WHERE cart.user_id = ?
+'''
+
+CHECKOUT_ITEMS_SQL = '''
+    INSERT INTO order_items (order_id, product_id, quantity, price)
+    SELECT ?, cart.product_id, cart.quantity, products.price
+    FROM cart
+    JOIN products ON cart.product_id = products.id
+    WHERE cart.user_id = ?
+'''
+
+# ? is a JSON array of product IDs
+ANY_TRACKED_SQL = "SELECT EXISTS (SELECT 1 FROM inventory WHERE product_id IN (SELECT value FROM json_each(?)))"
+
+TAKE_OWN_STRIPE_SQL = '''
+    UPDATE inventory SET stock = stock - ?
+    WHERE product_id = ? AND stripe = ? % (SELECT COUNT(*) FROM inventory WHERE product_id = ?)
+    AND stock >= ?
+'''
+
+PRODUCT_STRIPES_SQL = "SELECT stripe, stock FROM inventory WHERE product_id = ? ORDER BY stock DESC"
+
+RETURN_STOCK_SQL = '''
+    UPDATE inventory SET stock = stock + ?
+    WHERE product_id = ? AND stripe = (SELECT MIN(stripe) FROM inventory WHERE product_id = ?)
+'''
+
+RESERVE_STOCK_SQL = '''
+    INSERT INTO stock_reservations (user_id, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, product_id) DO UPDATE SET
+        quantity = quantity + excluded.quantity, expires_at = excluded.expires_at
+'''
+
+USER_RESERVATIONS_SQL = "SELECT product_id, quantity FROM stock_reservations WHERE user_id = ?"
+
+TRACKED_CART_LINES_SQL = '''
+    SELECT cart.product_id, cart.quantity FROM cart
+    WHERE cart.user_id = ?
+    AND EXISTS (SELECT 1 FROM inventory WHERE inventory.product_id = cart.product_id)
+'''
+
+# Left to itself the planner walks the product index, i.e. every reservation
+EXPIRED_RESERVATIONS_SQL = '''
+    SELECT product_id, SUM(quantity) FROM stock_reservations INDEXED BY idx_stock_reservations_expiry
+    WHERE expires_at < ? GROUP BY product_id
+'''
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from queries import CO_PURCHASES_SQL, UNITS_SOLD_SQL
+from rows import Recommendation
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationEngine:
+    """Precomputed "customers also bought" recommendations.
+
+    Co-purchase counts are accumulated from ``order_items`` incrementally:
+    each refresh only reads order lines past the last order ID it has seen,
+    then rebuilds the top-K table for the products those lines touched.
+    Candidates are ranked by co-purchase count with a bonus for sharing the
+    product's category, and any remaining slots are filled with the best
+    sellers of the same category.  A lookup is a dict access plus a slice.
+
+    Refreshes run on a background thread, woken by new orders, a catalog
+    change, or every ``refresh_interval`` seconds; lookups always serve the
+    table as it is and never wait for a rebuild.  The thread starts with
+    the first lookup unless start() was called earlier.
+    """
+
+    def __init__(self, db, k=8, category_boost=1.0, refresh_interval=60.0):
+        self.db = db
+        self.k = k
+        self.category_boost = category_boost
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._co_counts = defaultdict(Counter)
+        self._units_sold = Counter()
+        self._last_order_id = 0
+        self._catalog_version = None
+        self._refreshed_at = 0.0
+        self._dirty = True
+        self._table = {}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._wake.set()
+            self._thread = threading.Thread(target=self._run, name="recommendation-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                if self._needs_refresh():
+                    self.refresh()
+            except Exception:
+                logger.exception("Recommendation refresh failed")
+            finally:
+                self.db.release_connections()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def mark_dirty(self):
+        """Note that new orders exist and wake the refresh thread."""
+        self._dirty = True
+        self._wake.set()
+
+    def _needs_refresh(self):
+        return (self._dirty
+                or self._catalog_version != self.db.catalog_version()
+                or time.monotonic() - self._refreshed_at > self.refresh_interval)
+
+    def _read_new_orders(self):
+        conn = self.db.read_connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(id) FROM orders")
+            newest = cursor.fetchone()[0] or 0
+            if newest <= self._last_order_id:
+                return set()
+
+            cursor.execute(CO_PURCHASES_SQL, (self._last_order_id, newest))
+            touched = set()
+            for product_id, other_id, count in cursor:
+                self._co_counts[product_id][other_id] += count
+                touched.add(product_id)
+
+            cursor.execute(UNITS_SOLD_SQL, (self._last_order_id, newest))
+            for product_id, units in cursor:
+                self._units_sold[product_id] += units
+                touched.add(product_id)
+
+            self._last_order_id = newest
+            return touched
+        finally:
+            conn.close()
+
+    def _best_sellers(self, snapshot, category, cache):
+        ranked = cache.get(category)
+        if ranked is None:
+            ranked = cache[category] = sorted((other[0] for other in snapshot.by_category.get(category, ())),
+                                              key=lambda other_id: (-self._units_sold[other_id], other_id))
+        return ranked
+
+    def _rank(self, product, snapshot, best_sellers):
+        category = product[3]
+        co_counts = self._co_counts.get(product[0], ())
+        scored = []
+        for other_id in co_counts:
+            other = snapshot.by_id.get(other_id)
+            if other is None:
+                continue
+            score = co_counts[other_id] + (self.category_boost if other[3] == category else 0.0)
+            scored.append((-score, other_id))
+        scored.sort()
+        ranked = [other_id for _, other_id in scored[:self.k]]
+
+        if len(ranked) < self.k:
+            seen = set(ranked)
+            seen.add(product[0])
+            for other_id in self._best_sellers(snapshot, category, best_sellers):
+                if len(ranked) == self.k:
+                    break
+                if other_id not in seen:
+                    ranked.append(other_id)
+
+        by_id = snapshot.by_id
+        return tuple(Recommendation(other_id, by_id[other_id][1], by_id[other_id][2], by_id[other_id][4])
+                     for other_id in ranked)
+
+    def refresh(self):
+        """Fold new orders into the counts and rebuild the affected rows."""
+        with self._lock:
+            self._dirty = False
+            snapshot = self.db.catalog.snapshot()
+            version = snapshot.version
+            touched = self._read_new_orders()
+
+            if version != self._catalog_version:
+                # Products or categories changed; every row may be affected
+                table = {}
+                touched = snapshot.by_id.keys()
+            else:
+                table = dict(self._table)
+                # Best sellers fill other products' rows in the same category
+                categories = {snapshot.by_id[p][3] for p in touched if p in snapshot.by_id}
+                touched = set(touched)
+                for category in categories:
+                    touched.update(other[0] for other in snapshot.by_category.get(category, ()))
+
+            best_sellers = {}
+            for product_id in touched:
+                product = snapshot.by_id.get(product_id)
+                if product is not None:
+                    table[product_id] = self._rank(product, snapshot, best_sellers)
+
+            self._table = table
+            self._catalog_version = version
+            self._refreshed_at = time.monotonic()
+
+    def top_k(self, product_id, k=None):
+        """Return up to ``k`` Recommendation rows for a product from the current table."""
+        if self._thread is None:
+            self.start()
+        elif self._catalog_version != self.db.catalog_version():
+            self._wake.set()
+        return list(self._table.get(product_id, ())[:k or self.k])
@@ -0,0 +1,72 @@
+import functools
+import hashlib
+import inspect
+
+from flask import make_response, request, session
+
+from ttl_cache import TTLCache
+
+
+class ResponseCache:
+    """Bounded cache of rendered pages with strong ETags.
+
+    Pages are keyed on (endpoint, view arguments, query string, catalog
+    version, logged-in user), so any catalog write makes every cached page
+    unreachable and one user's page is never served to another.  Cached or
+    not, responses carry an ETag and a matching If-None-Match gets a 304.
+    """
+
+    def __init__(self, version_func, max_entries=512, ttl=60.0):
+        self.version_func = version_func
+        self._store = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def _key(self, kwargs):
+        return (request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                self.version_func(),
+                session.get('user_id'))
+
+    def _finish(self, key, rv):
+        """Cache a freshly rendered 200 response; pass anything else through untouched."""
+        response = make_response(rv)
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        body = response.get_data()
+        entry = ('"' + hashlib.sha256(body).hexdigest()[:32] + '"', body, response.mimetype)
+        self._store.set(key, entry)
+        return self._respond(entry, key[-1])
+
+    def _respond(self, entry, user_id):
+        etag, body, mimetype = entry
+        response = make_response(body)
+        response.mimetype = mimetype
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache' if user_id else 'public, no-cache'
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        """Decorate a GET view (sync or async) so its output is cached."""
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(*args, **kwargs):
+                key = self._key(kwargs)
+                entry = self._store.get(key)
+                if entry is not None:
+                    return self._respond(entry, key[-1])
+                return self._finish(key, await view(*args, **kwargs))
+        else:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self._key(kwargs)
+                entry = self._store.get(key)
+                if entry is not None:
+                    return self._respond(entry, key[-1])
+                return self._finish(key, view(*args, **kwargs))
+        return wrapper
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        return self._store.stats()
@@ -0,0 +1,54 @@
+"""Row types returned by DatabaseManager.
+
+Every row is a namedtuple: fixed slots, no per-row __dict__, and built
+straight from a cursor row with ``_make``.  Product rows keep their column
+order, so code and templates that index them by position still work.  Rows
+that used to be dicts can also be read by key (``item['price']`` as well as
+``item.price``).
+"""
+from collections import namedtuple
+
+
+class _Record:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self._fields
+
+
+Product = namedtuple('Product', ['id', 'name', 'price', 'category', 'image_url', 'thumbnail_url', 'webp_url', 'sku'])
+
+
+class CartItem(_Record, namedtuple('CartItem', ['id', 'name', 'price', 'quantity', 'image_url', 'product_id'])):
+    __slots__ = ()
+
+
+class CartSummary(_Record, namedtuple('CartSummary', ['count', 'total', 'version'])):
+    __slots__ = ()
+
+
+class UserDetails(_Record, namedtuple('UserDetails', ['username', 'email', 'address'])):
+    __slots__ = ()
+
+
+class Order(_Record, namedtuple('Order', ['id', 'total_price', 'date', 'items'])):
+    __slots__ = ()
+
+
+class OrderItem(_Record, namedtuple('OrderItem', ['name', 'quantity', 'price', 'image_url'])):
+    __slots__ = ()
+
+
+class Recommendation(_Record, namedtuple('Recommendation', ['id', 'name', 'price', 'image_url'])):
+    __slots__ = ()
@@ -0,0 +1,127 @@
+"""Server-side sessions shared by every worker process.
+
+The cookie only carries a random session ID; the data lives in a backend.
+SQLiteSessionBackend keeps it in the application database so any number of
+workers, and restarts, see the same sessions.  MemorySessionBackend is a
+single-process stand-in for development and tests.
+"""
+import random
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict  # type: ignore
+
+from queries import LOAD_SESSION_SQL
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.regenerated = False
+
+    def regenerate(self):
+        """Move the data to a fresh session ID, e.g. after logging in."""
+        self.regenerated = True
+        self.modified = True
+
+
+class MemorySessionBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._sessions[sid] = (data, expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLiteSessionBackend:
+    """Sessions stored in the ``sessions`` table of a DatabaseManager's database."""
+
+    def __init__(self, db, cleanup_probability=0.01):
+        self.db = db
+        self.cleanup_probability = cleanup_probability
+
+    def load(self, sid):
+        with self.db.read_connect() as conn:
+            row = conn.execute(LOAD_SESSION_SQL, (sid, time.time())).fetchone()
+        return row
+
+    def save(self, sid, data, expires_at):
+        with self.db.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                         (sid, data, expires_at))
+            # Purge expired sessions now and then instead of on a schedule
+            if random.random() < self.cleanup_probability:
+                conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, sid):
+        with self.db.connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, lifetime=7 * 24 * 3600):
+        self.backend = backend
+        self.lifetime = lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.backend.load(sid)
+            if entry is not None:
+                data, expires_at = entry
+                return ServerSideSession(self.serializer.loads(data), sid, expires_at)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid is not None:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        # Extend the expiry once half the lifetime is used up, not on every request
+        refresh = session.expires_at is None or session.expires_at - now < self.lifetime / 2
+        if not (session.modified or refresh):
+            return
+
+        if session.regenerated and session.sid is not None:
+            self.backend.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+
+        session.expires_at = now + self.lifetime
+        self.backend.save(session.sid, self.serializer.dumps(dict(session)), session.expires_at)
+        response.set_cookie(name, session.sid, max_age=self.lifetime, domain=domain, path=path,
+                            secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app),
+                            samesite=self.get_cookie_samesite(app))
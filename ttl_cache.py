@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Loaders that read from the database should take a token() before the
+    read and pass it to set(); if that key was invalidated in the meantime
+    the value is dropped instead of caching something already stale. Popping
+    one key leaves loads of the other keys alone.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        # Generation at which each recently popped key was invalidated, and the
+        # newest generation that is no longer known per key (clear() or trimmed)
+        self._popped = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def token(self):
+        return self._generation
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, token=None):
+        with self._lock:
+            if token is not None and (token < self._floor or token < self._popped.get(key, 0)):
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._generation += 1
+            self._popped[key] = self._generation
+            self._popped.move_to_end(key)
+            while len(self._popped) > self.max_entries:
+                self._floor = self._popped.popitem(last=False)[1]
+            entry = self._entries.pop(key, None)
+            return entry[1] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._floor = self._generation
+            self._popped.clear()
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,174 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    """Raised when a write cannot be queued, or committed, within the queue's timeouts."""
+
+
+class WriteBehindQueue:
+    """Applies small writes from a dedicated thread in group-commit batches.
+
+    Callers submit statements instead of running them; the writer thread
+    gathers up to ``max_batch`` of them, or whatever arrives within
+    ``max_delay`` seconds, and commits them in one transaction, so one fsync
+    covers the whole batch.  Each statement runs in its own savepoint, so
+    one failing write does not undo the others.
+
+    ``durability`` picks what submit() waits for: "commit" blocks until the
+    batch holding the write has committed (at most ``commit_timeout``
+    seconds) and re-raises its error, "queued" returns as soon as the write
+    is queued (errors are only logged).  A batch that cannot get the writer
+    connection fails as a whole; the writer thread carries on.
+
+    Writes are tracked per user: wait_for(user_id) blocks until that user's
+    queued writes are committed, which read paths use to see their own
+    writes.
+    """
+
+    def __init__(self, db, max_batch=64, max_delay=0.005, max_pending=10000, put_timeout=1.0,
+                 commit_timeout=60.0, durability="commit"):
+        if durability not in ("commit", "queued"):
+            raise ValueError("durability must be 'commit' or 'queued'")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.commit_timeout = commit_timeout
+        self.durability = durability
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = Counter()
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.writes = 0
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, sql, params=(), many=False, on_commit=None):
+        """Queue one statement on behalf of ``user_id``.
+
+        ``on_commit`` is called on the writer thread after the batch commits.
+        """
+        future = Future()
+        with self._cond:
+            self._pending[user_id] += 1
+        try:
+            self._queue.put((user_id, sql, params, many, on_commit, future), timeout=self.put_timeout)
+        except queue.Full:
+            self._done(user_id)
+            raise WriteQueueFull(f"{self._queue.qsize()} writes already queued") from None
+
+        if self.durability == "commit":
+            try:
+                return future.result(timeout=self.commit_timeout)
+            except FutureTimeout:
+                raise WriteQueueFull(f"write not committed within {self.commit_timeout}s") from None
+        return None
+
+    def _done(self, user_id):
+        with self._cond:
+            self._pending[user_id] -= 1
+            if self._pending[user_id] <= 0:
+                del self._pending[user_id]
+                self._cond.notify_all()
+
+    def wait_for(self, user_id, timeout=5.0):
+        """Block until every queued write for ``user_id`` has been committed."""
+        with self._cond:
+            return self._cond.wait_for(lambda: user_id not in self._pending, timeout=timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _apply(self, batch):
+        results = []
+        conn = None
+        try:
+            # A PoolTimeout here fails this batch instead of killing the writer thread
+            conn = self.db.connect()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for user_id, sql, params, many, on_commit, future in batch:
+                cursor.execute("SAVEPOINT write")
+                try:
+                    if many:
+                        cursor.executemany(sql, params)
+                    else:
+                        cursor.execute(sql, params)
+                    cursor.execute("RELEASE write")
+                    results.append(None)
+                except sqlite3.Error as e:
+                    cursor.execute("ROLLBACK TO write")
+                    cursor.execute("RELEASE write")
+                    results.append(e)
+            conn.commit()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            results = [e] * len(batch)
+        finally:
+            if conn is not None:
+                conn.close()
+        return results
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            results = self._apply(batch)
+            self.batches += 1
+            self.writes += len(batch)
+
+            for (user_id, sql, params, many, on_commit, future), error in zip(batch, results):
+                if error is None and on_commit is not None:
+                    try:
+                        on_commit()
+                    except Exception:
+                        logger.exception("on_commit callback failed")
+                if error is not None:
+                    if self.durability == "queued":
+                        logger.error("Queued write failed: %s (%s)", " ".join(sql.split()), error)
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+                self._done(user_id)
+
+    def close(self, timeout=10.0):
+        """Apply everything still queued, then stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+        }